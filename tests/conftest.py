@@ -0,0 +1,29 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: conftest.py
+# Description: pytest setup for the 'tfli2c' tests.
+#  `tfli2c_test.py` and `tfli2c_simple.py` are scripts
+#  that run against a real device, so pytest leaves them
+#  alone.  The `sim` fixture attaches simulated buses,
+#  and puts the module settings back afterwards.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import pytest
+import tfli2c as tfl
+
+collect_ignore = [ 'tfli2c_test.py', 'tfli2c_simple.py']
+
+#  Quick saves and resets, and no noise, so tests run
+#  fast and can compare distances exactly
+SIM_OPTIONS = dict( noise = 0, latency = 0.001, saveTime = 0.01,
+                    resetTime = 0.02, seed = 1)
+
+@pytest.fixture
+def sim():
+    ''' Return a function that attaches simulated buses '''
+    saved = ( tfl.busFactory, tfl.stats, tfl.device, tfl.tflAddr, tfl.tflPort)
+    def attach( addrs = ( 0x10,), ports = ( 4,), **options):
+        return tfl.simulate( addrs, ports, **dict( SIM_OPTIONS, **options))
+    yield attach
+    if tfl.device is not None and tfl.device is not saved[ 2]:
+        tfl.device.close()
+    tfl.busFactory, tfl.stats, tfl.device, tfl.tflAddr, tfl.tflPort = saved
@@ -0,0 +1,53 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_apply.py
+# Description: Tests of `apply()` for one device and
+#  for a group.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import pytest
+import tfli2c as tfl
+
+def test_apply_writes_only_changes( sim):
+    buses = sim()
+    device = buses[ 4].devices[ 0]
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        result = sensor.apply( { 'fps': 100, 'mode': 'continuous'})
+        assert result.changed == {} and result.ok
+        saved = device.transactions
+        result = sensor.apply( { 'fps': 20})
+        assert result.changed == { 'fps': 20} and result.ok
+    assert device.flash[ tfl.TFL_FPS_LO] == 20
+    assert device.transactions > saved
+
+def test_apply_unknown_setting( sim):
+    sim()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        with pytest.raises( ValueError):
+            sensor.apply( { 'colour': 'red'})
+
+def test_group_apply_one_config( sim):
+    buses = sim( [ 0x10, 0x11, 0x12])
+    buses[ 4].devices[ 1].flash[ tfl.TFL_FPS_LO] = 50
+    buses[ 4].devices[ 1]._boot( 0)
+    with tfl.SensorGroup( [ 0x10, 0x11, 0x12], 4) as group:
+        results = group.apply( { 'fps': 50})
+    assert [ r.changed for r in results] == [ { 'fps': 50}, {}, { 'fps': 50}]
+    assert all( r.ok for r in results)
+    assert [ d.flash[ tfl.TFL_FPS_LO] for d in buses[ 4].devices] == [ 50] * 3
+
+def test_group_apply_by_address( sim):
+    buses = sim( [ 0x10, 0x11])
+    with tfl.SensorGroup( [ 0x10, 0x11], 4) as group:
+        results = group.apply( { 0x10: { 'addr': 0x20},
+                                 0x11: { 'mode': 'trigger'}})
+        assert [ sensor.addr for sensor in group] == [ 0x20, 0x11]
+    assert [ ( r.addr, r.ok) for r in results] == [ ( 0x20, True),
+                                                    ( 0x11, True)]
+    assert sorted( d.addr for d in buses[ 4].devices) == [ 0x11, 0x20]
+    assert buses[ 4].devices[ 1].regs[ tfl.TFL_SET_MODE] == 1
+
+def test_group_apply_shared_address( sim):
+    sim( [ 0x10, 0x11])
+    with tfl.SensorGroup( [ 0x10, 0x11], 4) as group:
+        with pytest.raises( ValueError):
+            group.apply( { 'addr': 0x20})
@@ -0,0 +1,119 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_batch.py
+# Description: Tests of `RdwrBus` and of the batched
+#  rounds of `SensorGroup`.  The ioctl is replaced by a
+#  fake that unpacks each I2C_RDWR request and passes it
+#  on to a simulated bus.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import ctypes
+
+import tfli2c as tfl
+
+#  A bus without the batch operations, as `smbus.SMBus`
+class PlainBus:
+    def __init__( self, bus):
+        self.bus = bus
+
+    def __getattr__( self, name):
+        if name in ( 'writeMany', 'readMany'):
+            raise AttributeError( name)
+        return getattr( self.bus, name)
+
+#  Stands in for `fcntl.ioctl`.  A write of one byte sets
+#  the register pointer of a device, as on the real bus.
+class FakeIoctl:
+    def __init__( self, bus):
+        self.bus = bus
+        self.calls = []          # ( addr, flags, len) of each message
+        self.pointer = {}
+
+    def __call__( self, fd, request, data):
+        assert request == tfl.I2C_RDWR
+        msgs = [ data.msgs[ i] for i in range( data.nmsgs)]
+        self.calls.append( [ ( m.addr, m.flags, m.len) for m in msgs])
+        for msg in msgs:
+            if msg.flags & tfl.I2C_M_RD:
+                block = self.bus.device( msg.addr).read(
+                    self.pointer.get( msg.addr, 0), msg.len)
+                ctypes.memmove( msg.buf, bytes( block), msg.len)
+                continue
+            sent = ctypes.string_at( msg.buf, msg.len)
+            if len( sent) == 1:
+                self.pointer[ msg.addr] = sent[ 0]
+            elif sent:
+                self.bus.device( msg.addr).write( sent[ 0], list( sent[ 1:]))
+            else:
+                self.bus.device( msg.addr).read( 0, 0)
+
+def rdwrBus( bus):
+    rdwr = tfl.RdwrBus.__new__( tfl.RdwrBus)
+    rdwr.port, rdwr.fd = bus.port, None
+    rdwr.ioctl = FakeIoctl( bus)
+    return rdwr
+
+def opNames():
+    return { op[ 'op'] for op in tfl.getStats()[ 'ops']}
+
+#  - - - -  Message packing  - - - -
+def test_rdwr_messages( sim):
+    buses = sim( [ 0x10, 0x11], dist = 150, latency = 0)
+    bus = rdwrBus( buses[ 4])
+    bus.write_byte_data( 0x10, tfl.TFL_SET_MODE, 1)
+    assert buses[ 4].devices[ 0].regs[ tfl.TFL_SET_MODE] == 1
+    assert bus.read_word_data( 0x10, tfl.TFL_FPS_LO) == 100
+    bus.writeMany( [ ( 0x10, tfl.TFL_TRIGGER, 1), ( 0x11, tfl.TFL_TRIGGER, 1)])
+    blocks = bus.readMany( [ ( 0x10, 0, 6), ( 0x11, 0, 6)])
+    assert [ block[ : 2] for block in blocks] == [ [ 150, 0]] * 2
+    calls = bus.ioctl.calls
+    assert calls[ -2] == [ ( 0x10, 0, 2), ( 0x11, 0, 2)]
+    assert calls[ -1] == [ ( 0x10, 0, 1), ( 0x10, tfl.I2C_M_RD, 6),
+                           ( 0x11, 0, 1), ( 0x11, tfl.I2C_M_RD, 6)]
+
+def test_rdwr_splits_at_kernel_limit( sim):
+    buses = sim()
+    bus = rdwrBus( buses[ 4])
+    blocks = bus.readMany( [ ( 0x10, 0, 2)] * 30)
+    assert len( blocks) == 30
+    assert [ len( call) for call in bus.ioctl.calls] ==\
+           [ tfl.I2C_RDWR_MAX_MSGS, 60 - tfl.I2C_RDWR_MAX_MSGS]
+
+#  - - - -  Batched rounds  - - - -
+def test_group_uses_batches( sim):
+    buses = sim( [ 0x10, 0x11, 0x12], dist = 90)
+    tfl.setBackend( lambda port: rdwrBus( buses[ port]))
+    tfl.instrument()
+    with tfl.SensorGroup( [ 0x10, 0x11, 0x12], 4) as group:
+        frames = group.getData()
+    assert [ frame.dist for frame in frames] == [ 90] * 3
+    assert { 'writeMany', 'readMany'} <= opNames()
+    assert 'read_i2c_block_data' not in opNames()
+
+def test_failed_batch_reads_one_by_one( sim):
+    buses = sim( [ 0x10, 0x11, 0x12])
+    buses[ 4].devices[ 1].offline = True
+    with tfl.SensorGroup( [ 0x10, 0x11, 0x12], 4,
+                          bus = rdwrBus( buses[ 4])) as group:
+        frames = group.getData()
+    assert [ frame.status for frame in frames] ==\
+           [ tfl.TFL_READY, tfl.TFL_I2CWRITE, tfl.TFL_READY]
+
+#  Wrapped plain buses must not look like batch buses
+def test_instrumented_plain_bus_reads_one_by_one( sim):
+    buses = sim( [ 0x10, 0x11])
+    tfl.setBackend( lambda port: PlainBus( buses[ port]))
+    tfl.instrument()
+    with tfl.SensorGroup( [ 0x10, 0x11], 4) as group:
+        frames = group.getData()
+    assert [ frame.status for frame in frames] == [ tfl.TFL_READY] * 2
+    assert { 'trigger', 'read_i2c_block_data'} <= opNames()
+    assert 'readMany' not in opNames()
+
+def test_retried_instrumented_plain_bus( sim):
+    buses = sim( [ 0x10, 0x11])
+    tfl.setBackend( lambda port: PlainBus( buses[ port]))
+    tfl.instrument()
+    with tfl.SensorGroup( [ 0x10, 0x11], 4, retries = 2) as group:
+        frames = group.getData()
+    assert [ frame.status for frame in frames] == [ tfl.TFL_READY] * 2
+    assert 'readMany' not in opNames()
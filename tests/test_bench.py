@@ -0,0 +1,26 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_bench.py
+# Description: Tests of the benchmark suite, run on the
+#  simulated bus.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import json
+
+import tfli2c as tfl
+
+def test_bench_json_to_stdout( sim, capsys):
+    assert tfl.main( [ 'bench', '--sim', '--seconds', '0.05',
+                       '--case', 'getData', 'group', '--json', '-']) == 0
+    out, err = capsys.readouterr()
+    report = json.loads( out)
+    assert [ r[ 'case'] for r in report[ 'results']] == [ 'getData', 'group']
+    assert 'samples/s' in err and 'calls/s' in err
+
+#  Only new measurements count as samples
+def test_bench_counts_new_frames( sim):
+    sim( [ 0x10, 0x11])
+    results = tfl.bench( [ 0x10, 0x11], 4, 0.1, [ 'getData', 'group'])
+    for result in results:
+        assert result[ 'samples'] <= result[ 'calls'] * 2
+    single = results[ 0]
+    assert single[ 'samples'] <= single[ 'calls']
@@ -0,0 +1,52 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_buffer.py
+# Description: Tests of `SampleBuffer` and of the frames
+#  a device keeps in it.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import pytest
+import tfli2c as tfl
+
+needsNumpy = pytest.mark.skipif( tfl.numpy is None, reason = "needs numpy")
+
+#  A bus that returns the same data registers every time
+class BlockBus:
+    def __init__( self, block):
+        self.block = block
+
+    def read_i2c_block_data( self, addr, reg, length):
+        return self.block[ : length]
+
+def test_latest_after_wrapping():
+    buffer = tfl.SampleBuffer( 4)
+    for n in range( 10):
+        buffer.append( n, n, 100 + n, 1000, 4000, 0)
+    assert len( buffer) == 4
+    assert list( buffer.latest().dist) == [ 106, 107, 108, 109]
+    assert list( buffer.latest( 2).tick) == [ 8, 9]
+    assert list( buffer.latest( 9).time) == [ 6, 7, 8, 9]
+
+@needsNumpy
+def test_arrays_share_memory():
+    buffer = tfl.SampleBuffer( 4)
+    buffer.append( 0, 1, 2, 3, 4, 0)
+    view = buffer.arrays().dist
+    buffer.append( 0, 1, 99, 3, 4, 0)
+    assert view[ 0] == 2
+    buffer.data[ 2][ 4] = 77              # the copy the view sees
+    assert view[ 0] == 77
+
+#  A frame read again, with the same tick, is kept once
+def test_device_keeps_each_frame_once():
+    bus = BlockBus( [ 100, 0, 232, 3, 160, 15, 5, 0])     # tick 5
+    sensor = tfl.TFLuna( 0x10, 4, bus)
+    sensor.buffer = tfl.SampleBuffer( 8)
+    sensor.readData( 8)
+    sensor.readData( 8)
+    assert len( sensor.buffer) == 1
+    bus.block[ 6] = 6
+    sensor.readData( 8)
+    assert list( sensor.buffer.latest().tick) == [ 5, 6]
+    sensor.readData( 6)                                   # no tick
+    sensor.readData( 6)
+    assert len( sensor.buffer) == 4
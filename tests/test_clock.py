@@ -0,0 +1,73 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_clock.py
+# Description: Tests of `TickClock` and of the capture
+#  time stamps of frames.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import time
+
+import pytest
+import tfli2c as tfl
+
+def test_estimates_drift():
+    clock = tfl.TickClock( window = 1.0)
+    drift = 1e-4
+    for n in range( 2000):
+        host = n * 0.01
+        tick = int( host * ( 1 + drift) * 1000) & 0xFFFF
+        clock.update( tick, host + 0.0003 * ( n % 3), host - 0.001)
+    assert clock.drift == pytest.approx( drift, abs = 5e-5)
+
+#  Ticks count on across many wraps of the register
+def test_unwraps_ticks():
+    clock = tfl.TickClock()
+    for n in range( 400):
+        host = 100 + n * 0.5
+        tick = int( n * 500) & 0xFFFF
+        stamp = clock.update( tick, host)
+        assert stamp == pytest.approx( host, abs = 0.002)
+    assert clock.device == pytest.approx( 399 * 0.5)
+
+#  A long gap is counted in whole wraps from the host time
+def test_unwraps_across_a_gap():
+    clock = tfl.TickClock()
+    clock.update( 1000, 10.0)
+    clock.update( ( 1000 + 200500) & 0xFFFF, 210.5)
+    assert clock.device == pytest.approx( 200.5)
+
+#  A tick that jumps back, as after a reset, starts again
+def test_resets_on_a_jump():
+    clock = tfl.TickClock()
+    for n in range( 10):
+        clock.update( 30000 + n * 10, 50 + n * 0.01)
+    assert clock.device == pytest.approx( 0.09)
+    stamp = clock.update( 5, 50.1)
+    assert clock.device == 0.0 and len( clock.points) == 0
+    assert stamp == pytest.approx( 50.1)
+
+def test_capture_time_stamps( sim, tmp_path):
+    sim()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.buffer = tfl.SampleBuffer( 8)
+        before = time.time()
+        sensor.getData()
+        after = time.time()
+        frame = sensor.frame()
+    assert frame.tick is not None and frame.time is not None
+    stamp = sensor.buffer.latest().time[ -1]
+    assert before - 0.05 <= stamp <= after
+    with tfl.Recorder( str( tmp_path)) as recorder:
+        time.sleep( 0.05)
+        recorder.addFrame( frame)
+    recorded = list( tfl.RecordReader( str( tmp_path)).records())[ 0][ 0]
+    assert recorded == pytest.approx( stamp, abs = 0.01)
+
+#  A six byte read has no tick, so no capture time
+def test_short_read_has_no_time( sim):
+    sim()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.readData()
+        assert sensor.frame().tick is not None
+        sensor.readData( 6)
+        frame = sensor.frame()
+    assert frame.tick is None and frame.time is None
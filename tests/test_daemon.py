@@ -0,0 +1,38 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_daemon.py
+# Description: Tests of the shared memory daemon.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import errno
+import os
+import threading
+import time
+
+import pytest
+import tfli2c as tfl
+
+def test_daemon_publishes_and_owns_ring( sim):
+    sim( [ 0x10])
+    name = f"tflitest{os.getpid()}"
+    daemon = tfl.Daemon( { 4: [ 0x10]}, rate = 50, name = name,
+                         capacity = 64)
+    try:
+        with pytest.raises( OSError) as error:
+            tfl.SharedRing( [ ( 4, 0x10)], name)
+        assert error.value.errno == errno.EBUSY
+        runner = threading.Thread( target = daemon.run)
+        runner.start()
+        reader = tfl.SharedReader( name)
+        deadline = time.monotonic() + 2
+        while reader.count < 3 and time.monotonic() < deadline:
+            time.sleep( 0.01)
+        daemon.stop()
+        runner.join( 2)
+        assert not runner.is_alive()
+        record = reader.latest()
+        assert reader.sensors == [ ( 4, 0x10)]
+        assert record.dist == 100 and abs( record.time - time.time()) < 5
+        reader.close()
+    finally:
+        daemon.close()
+    daemon.close()                       # already gone is fine
@@ -0,0 +1,80 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_detector.py
+# Description: Tests of zone and rate of change events.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import time
+from types import SimpleNamespace
+
+import tfli2c as tfl
+
+#  Feed the detector frames without a bus
+def feed( detector, dists, times = None, addr = 0x10):
+    for n, dist in enumerate( dists):
+        detector.feed( SimpleNamespace(
+            status = tfl.TFL_READY, port = 4, addr = addr, dist = dist,
+            time = times[ n] if times else n * 0.1))
+
+def test_zone_events( sim):
+    buses = sim( latency = 0, dist = 200)
+    device = buses[ 4].devices[ 0]
+    detector = tfl.Detector()
+    detector.zone( 'near', 0, 50, debounce = 2)
+    seen = []
+    detector.subscribe( seen.append)
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        detector.attach( sensor)
+        sensor.setModeTrig()
+        device.dist = 30
+        sensor.getData()
+        sensor.readData()                 # the same frame again
+        assert seen == []
+        time.sleep( 0.002)
+        sensor.getData()
+    assert [ ( e.name, e.active, e.dist) for e in seen] == [ ( 'near', True, 30)]
+    assert detector.get( 0) == seen[ 0]
+    assert detector.active( 'near', 0x10)
+
+#  Six byte reads have no tick, so every one is watched
+def test_short_reads_are_watched( sim):
+    buses = sim( dist = 100)
+    device = buses[ 4].devices[ 0]
+    detector = tfl.Detector()
+    detector.zone( 'near', 0, 50, debounce = 2)
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        detector.attach( sensor)
+        for dist in ( 100, 80, 60, 40, 30):
+            device.dist = dist
+            time.sleep( 0.011)
+            sensor.readData( 6)
+    assert detector.active( 'near', 0x10)
+
+def test_zone_hysteresis():
+    detector = tfl.Detector()
+    detector.zone( 'near', 0, 50, hysteresis = 5)
+    feed( detector, [ 60, 45, 52, 54])
+    assert detector.active( 'near', 0x10)
+    feed( detector, [ 56])
+    assert not detector.active( 'near', 0x10)
+    assert [ e.active for e in iter( lambda: detector.get( 0), None)] ==\
+           [ True, False]
+
+def test_rate_events():
+    detector = tfl.Detector()
+    detector.rate( 'closing', -100, hysteresis = 20, alpha = 1)
+    feed( detector, [ 500, 495, 480, 465])       # -50, -150, -150 cm/s
+    assert detector.active( 'closing', 0x10)
+    feed( detector, [ 457], [ 0.4])              # -80 cm/s, within hysteresis
+    assert detector.active( 'closing', 0x10)
+    feed( detector, [ 456], [ 0.5])              # -10 cm/s
+    assert not detector.active( 'closing', 0x10)
+
+def test_rate_ignores_other_devices_and_bad_frames():
+    detector = tfl.Detector()
+    detector.rate( 'opening', 100, addr = 0x11, alpha = 1)
+    feed( detector, [ 0, 100, 200])
+    assert not detector.active( 'opening', 0x10)
+    detector.feed( SimpleNamespace( status = tfl.TFL_WEAK, port = 4,
+                                    addr = 0x11, dist = 0, time = 0))
+    feed( detector, [ 0, 50], addr = 0x11)
+    assert detector.active( 'opening', 0x11)
@@ -0,0 +1,112 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_device.py
+# Description: Tests of `TFLuna`, `SensorGroup`, the
+#  module functions and `AsyncTFLuna`, run against the
+#  simulated bus so they need no hardware.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import asyncio
+
+import pytest
+import tfli2c as tfl
+
+def mode( device):
+    return device.regs[ tfl.TFL_SET_MODE]
+
+def test_device_keeps_one_bus( sim):
+    buses = sim( dist = 123)
+    opened = []
+    tfl.setBackend( lambda port: opened.append( port) or buses[ port])
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        assert sensor.begin()
+        for n in range( 5):
+            sensor.getData()
+    assert opened == [ 4]
+
+def test_module_functions( sim):
+    sim( dist = 77, latency = 0)
+    assert tfl.begin( 0x10, 4)
+    assert tfl.getData()
+    assert tfl.getMode() == 'trigger'
+    assert tfl.getI2Caddr() == 0x10
+
+def test_group_reads_every_device( sim):
+    buses = sim( [ 0x10, 0x11, 0x12])
+    for n, device in enumerate( buses[ 4].devices):
+        device.dist = 100 + n
+    with tfl.SensorGroup( [ 0x10, 0x11, 0x12], 4) as group:
+        assert group.begin()
+        frames = group.getData()
+    assert [ frame.addr for frame in frames] == [ 0x10, 0x11, 0x12]
+    assert [ frame.dist for frame in frames] == [ 100, 101, 102]
+    assert all( frame.status == tfl.TFL_READY for frame in frames)
+
+def test_missing_device_fails_begin( sim):
+    sim( [ 0x10])
+    assert not tfl.TFLuna( 0x22, 4).begin()
+
+#  - - - -  Continuous streaming  - - - -
+def test_stream_yields_new_frames( sim):
+    buses = sim()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        frames = sensor.stream( 250)
+        ticks = [ next( frames).tick for n in range( 5)]
+        frames.close()
+    assert len( set( ticks)) == 5
+
+#  The mode and frame rate are put back as they were
+@pytest.mark.parametrize( 'trigger', [ False, True])
+def test_stream_restores_settings( sim, trigger):
+    buses = sim( fps = 50)
+    device = buses[ 4].devices[ 0]
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        if trigger:
+            sensor.setModeTrig()
+        frames = sensor.stream( 250)
+        next( frames)
+        assert mode( device) == 0 and device.regs[ tfl.TFL_FPS_LO] == 250
+        frames.close()
+    assert mode( device) == ( 1 if trigger else 0)
+    assert device.regs[ tfl.TFL_FPS_LO] == 50
+
+#  - - - -  asyncio  - - - -
+def test_async_reads( sim):
+    sim( [ 0x10, 0x11], dist = 55)
+    async def main():
+        sensors = [ tfl.AsyncTFLuna( tfl.TFLuna( addr, 4))
+                    for addr in ( 0x10, 0x11)]
+        for sensor in sensors:
+            await sensor.begin()
+        frames = await asyncio.gather( *( s.read() for s in sensors))
+        stream = sensors[ 0].frames( 50)
+        more = [ await stream.__anext__() for n in range( 3)]
+        await stream.aclose()
+        for sensor in sensors:
+            await sensor.__aexit__()
+        return frames, more
+    frames, more = asyncio.run( main())
+    assert [ frame.dist for frame in frames] == [ 55, 55]
+    assert len( more) == 3
+
+def test_async_rate_too_fast( sim):
+    sim()
+    async def main():
+        sensor = tfl.AsyncTFLuna( tfl.TFLuna( 0x10, 4))
+        with pytest.raises( ValueError):
+            await sensor.frames( 100).__anext__()
+        await sensor.__aexit__()
+    asyncio.run( main())
+
+#  - - - -  Snapshot and cached configuration  - - - -
+def test_snapshot_caches_config( sim):
+    sim( fps = 50)
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        snap = sensor.snapshot()
+        assert ( snap.addr, snap.fps, snap.prodCode) ==\
+               ( 0x10, 50, 'SIMLUNA0000001')
+        saved = sensor.bus.devices[ 0].transactions
+        assert sensor.getFrameRate() == 50
+        assert sensor.getI2Caddr() == 0x10
+        assert sensor.bus.devices[ 0].transactions == saved
+        sensor.setFrameRate( 20)
+        assert sensor.config is None
@@ -0,0 +1,99 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_filter.py
+# Description: Tests of `SignalFilter`, against plain
+#  sample by sample versions of each stage.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import math
+import pytest
+import tfli2c as tfl
+
+numpy = pytest.importorskip( 'numpy')
+
+#  - - - -  Sample by sample versions  - - - -
+def medianOf( row, size):
+    out = []
+    for i in range( len( row)):
+        window = [ v for v in row[ max( i - size + 1, 0) : i + 1]
+                   if not math.isnan( v)]
+        out.append( float( numpy.median( window)) if window else math.nan)
+    return out
+
+def emaOf( row, alpha):
+    out, avg = [], math.nan
+    for v in row:
+        if not math.isnan( v):
+            avg = v if math.isnan( avg) else avg + alpha * ( v - avg)
+        out.append( avg)
+    return out
+
+def kalmanOf( row, flux, q, r, fluxRef = 1000):
+    out, est, var = [], math.nan, 0.0
+    for v, f in zip( row, flux):
+        noise = r * fluxRef / max( f, 1)
+        var += q
+        if not math.isnan( v):
+            if math.isnan( est):
+                est, var = v, noise
+            else:
+                gain = var / ( var + noise)
+                est += gain * ( v - est)
+                var *= 1 - gain
+        out.append( est)
+    return out
+
+def batch( seed, sensors = 3, samples = 60):
+    rng = numpy.random.default_rng( seed)
+    dist = rng.normal( 100, 5, ( sensors, samples))
+    flux = rng.uniform( 0, 3000, ( sensors, samples))
+    flux[ 0, : samples // 2] = 10                     # rejected at first
+    return dist, flux
+
+def test_reject_flux():
+    filt = tfl.SignalFilter( minFlux = 100, maxFlux = 0x8000)
+    out = filt.process( [ 1, 2, 3], [ 50, 1000, 0x9000])
+    assert numpy.isnan( out[ 0]) and out[ 1] == 2 and numpy.isnan( out[ 2])
+
+def test_rolling_median():
+    dist, flux = batch( 1)
+    filt = tfl.SignalFilter( 3, median = 5)
+    out = filt.process( dist, flux)
+    kept = filt.reject( dist, flux)
+    for i in range( 3):
+        assert numpy.allclose( out[ i], medianOf( kept[ i], 5),
+                               equal_nan = True)
+
+def test_ema_holds_over_rejected_samples():
+    filt = tfl.SignalFilter( 2, alpha = 0.5)
+    dist = numpy.array( [[ 100, 110, 120], [ 50, 50, 50]], float)
+    flux = numpy.array( [[ 1000, 10, 1000], [ 1000, 1000, 1000]], float)
+    out = filt.process( dist, flux)
+    assert list( out[ 0]) == [ 100, 100, 110]
+    assert list( out[ 1]) == [ 50, 50, 50]
+
+def test_ema_matches_sample_by_sample():
+    dist, flux = batch( 2)
+    out = tfl.SignalFilter( 3, alpha = 0.2).process( dist, flux)
+    kept = tfl.SignalFilter( 3).reject( dist, flux)
+    for i in range( 3):
+        assert numpy.allclose( out[ i], emaOf( kept[ i], 0.2),
+                               equal_nan = True)
+
+def test_kalman_matches_sample_by_sample():
+    dist, flux = batch( 3)
+    out = tfl.SignalFilter( 3, q = 0.05, r = 4).process( dist, flux)
+    kept = tfl.SignalFilter( 3).reject( dist, flux)
+    for i in range( 3):
+        assert numpy.allclose( out[ i], kalmanOf( kept[ i], flux[ i], 0.05, 4),
+                               equal_nan = True)
+
+#  Any split into batches gives the same result as one batch
+def test_state_carries_between_batches():
+    dist, flux = batch( 4, samples = 100)
+    options = dict( median = 3, alpha = 0.3, q = 0.01, r = 2)
+    whole = tfl.SignalFilter( 3, **options).process( dist, flux)
+    filt = tfl.SignalFilter( 3, **options)
+    parts = [ filt.process( dist[ :, a : b], flux[ :, a : b])
+              for a, b in ( ( 0, 7), ( 7, 7), ( 7, 40), ( 40, 100))]
+    assert numpy.allclose( numpy.concatenate( parts, axis = 1), whole,
+                           equal_nan = True)
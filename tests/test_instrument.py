@@ -0,0 +1,42 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_instrument.py
+# Description: Tests of the hot path instrumentation.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import tfli2c as tfl
+
+def test_instrument_counts_ops( sim):
+    sim( [ 0x10, 0x11])
+    tfl.instrument()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.setModeTrig()
+        sensor.getData()
+    assert { op[ 'op'] for op in tfl.getStats()[ 'ops']} >=\
+           { 'trigger', 'read_i2c_block_data'}
+    tfl.resetStats()
+    with tfl.SensorGroup( [ 0x10, 0x11], 4) as group:
+        group.getData()
+    assert sum( s[ 'count'] for s in tfl.getStats()[ 'statuses']) == 2
+    tfl.instrument( False)
+    assert tfl.getStats() is None
+
+#  A frame read twice has its status counted once
+def test_status_counted_once_per_frame( sim):
+    sim( latency = 0)
+    tfl.instrument()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.setModeTrig()
+        sensor.setTrigger()
+        sensor.readData( 8)
+        sensor.readData( 8)
+    assert sum( s[ 'count'] for s in tfl.getStats()[ 'statuses']) == 1
+
+def test_cached_reads_cost_nothing( sim):
+    sim()
+    tfl.instrument()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.snapshot()
+        tfl.resetStats()
+        sensor.getFrameRate()
+        sensor.getMode()
+    assert tfl.getStats()[ 'ops'] == []
@@ -0,0 +1,23 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_multibus.py
+# Description: Tests of `MultiBus`, one thread per port.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import threading
+import time
+
+import tfli2c as tfl
+
+def test_rounds_and_close( sim):
+    sim( [ 0x10], ports = ( 1, 4))
+    multi = tfl.MultiBus( { 1: [ 0x10], 4: [ 0x10]}, rate = 50).start()
+    rounds = []
+    consumer = threading.Thread(
+        target = lambda: rounds.extend( multi.rounds()))
+    consumer.start()
+    time.sleep( 0.2)
+    multi.close()
+    consumer.join( 2)
+    assert not consumer.is_alive()
+    assert rounds and sorted( rounds[ 0].frames) == [ 1, 4]
+    assert [ r.index for r in rounds] == sorted( r.index for r in rounds)
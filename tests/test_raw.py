@@ -0,0 +1,54 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_raw.py
+# Description: Tests of raw frames and their batch
+#  decoding, with and without NumPy.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import pytest
+import tfli2c as tfl
+
+BLOCKS = [ bytes( [ 100, 0, 232, 3, 160, 15]),     # 100 cm, flux 1000
+           bytes( [ 50, 0, 10, 0, 160, 15])]       # weak
+
+@pytest.fixture( params = [ 'numpy', 'struct'])
+def decoder( request, monkeypatch):
+    if request.param == 'numpy':
+        if tfl.numpy is None:
+            pytest.skip( "needs numpy")
+    else:
+        monkeypatch.setattr( tfl, 'numpy', None)
+    return request.param
+
+def test_raw_frames_match_eval_data( decoder):
+    raw = tfl.RawFrames( b''.join( BLOCKS))
+    assert len( raw) == 2 and raw.tick is None
+    assert list( raw.dist) == [ 100, 50]
+    assert list( raw.status) == [ tfl.TFL_READY, tfl.TFL_WEAK]
+    assert list( raw.temp) == [ 40.0, 40.0]
+
+def test_raw_frames_with_ticks( decoder):
+    raw = tfl.RawFrames( [ block + bytes( [ n, 1]) for n, block
+                           in enumerate( BLOCKS)], size = 8)
+    assert list( raw.tick) == [ 256, 257]
+    assert len( tfl.RawFrames( b'', size = 8).dist) == 0
+
+def test_device_get_raw( sim):
+    sim( dist = 80, latency = 0)
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.setModeTrig()
+        block = sensor.getRaw()
+    assert isinstance( block, bytes) and len( block) == 6
+    assert list( tfl.RawFrames( block).dist) == [ 80]
+
+def test_group_get_raw_status( sim):
+    buses = sim( [ 0x10, 0x11, 0x12], dist = 80)
+    group = tfl.SensorGroup( [ 0x10, 0x11, 0x12], 4, quarantine = 1)
+    group.begin()
+    buses[ 4].devices[ 1].offline = True
+    data, status = group.getRaw()
+    raw = tfl.RawFrames( data)
+    assert status == [ tfl.TFL_READY, tfl.TFL_I2CWRITE, tfl.TFL_READY]
+    assert list( raw.dist) == [ 80, 0, 80]
+    assert all( sensor.triggered is None for sensor in group)
+    assert group.getRaw().status[ 1] == tfl.TFL_FAIL    # benched
+    group.close()
@@ -0,0 +1,34 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_record.py
+# Description: Tests of binary frame recording.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import pytest
+import tfli2c as tfl
+
+needsNumpy = pytest.mark.skipif( tfl.numpy is None, reason = "needs numpy")
+
+@needsNumpy
+def test_round_trip( tmp_path):
+    with tfl.Recorder( str( tmp_path), chunkRecords = 3) as recorder:
+        for n in range( 7):
+            recorder.add( 1000.0 + n, n, 100 + n, 1000, 4000, 0, 1)
+    reader = tfl.RecordReader( str( tmp_path))
+    assert len( reader) == 7 and len( reader.index) == 3
+    assert list( reader.read( 1002, 1004)[ 'dist']) == [ 102, 103, 104]
+    assert [ r[ 2] for r in reader.records()] == list( range( 100, 107))
+
+def test_adopts_orphan_chunks( tmp_path):
+    path = str( tmp_path)
+    crashed = tfl.Recorder( path)
+    for n in range( 3):
+        crashed.add( 1000.0 + n, n, 100, 1000, 4000, 0, 1)
+    crashed.flush()                      # never closed
+    with tfl.Recorder( path) as recorder:
+        assert recorder.index[ 0][ 'count'] == 3
+        recorder.add( 2000.0, 0, 200, 1000, 4000, 0, 1)
+    crashed.file.close()
+    reader = tfl.RecordReader( path)
+    assert [ e[ 'file'] for e in reader.index] ==\
+           [ 'chunk-000000.tfr', 'chunk-000001.tfr']
+    assert [ r[ 2] for r in reader.records()] == [ 100, 100, 100, 200]
@@ -0,0 +1,66 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_recovery.py
+# Description: Tests of retries, reset readiness and
+#  group quarantine.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import errno
+import time
+
+import pytest
+import tfli2c as tfl
+
+def test_retry_gives_up( monkeypatch):
+    calls = []
+    def fail():
+        calls.append( 1)
+        raise OSError( errno.EREMOTEIO, "no answer")
+    with pytest.raises( OSError):
+        tfl.retry( fail, retries = 2, base = 0)
+    assert len( calls) == 3
+
+def test_retry_bus_rides_out_faults( sim):
+    sim( failRate = 0.3)
+    with tfl.TFLuna( 0x10, 4, retries = 8) as sensor:
+        for n in range( 20):
+            sensor.snapshot()
+
+def test_wait_ready_after_save_and_reset( sim):
+    buses = sim()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.setI2Caddr( 0x30)
+        assert sensor.saveSettings( wait = True)
+        sensor.softReset()
+        sensor.addr = 0x30                # answers there once reset
+        assert sensor.waitReady()
+    assert buses[ 4].devices[ 0].addr == 0x30
+
+def test_wait_ready_needs_reboot( sim):
+    sim()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor._markReset()               # as if the reset was lost
+        assert not sensor.waitReady( timeout = 0.05)
+        assert sensor.softReset( wait = True)
+        assert sensor.resetTick is None
+
+def test_quarantine_and_rejoin( sim):
+    buses = sim( [ 0x10, 0x11])
+    group = tfl.SensorGroup( [ 0x10, 0x11], 4, quarantine = 2,
+                             rejoinTime = 0.05)
+    buses[ 4].devices[ 1].offline = True
+    for n in range( 2):
+        group.getData()
+    assert group.benched() == [ group.sensors[ 1]]
+    assert group.getData()[ 1].status == tfl.TFL_FAIL
+    buses[ 4].devices[ 1].offline = False
+    time.sleep( 0.06)
+    assert group.getData()[ 1].status == tfl.TFL_READY
+    assert group.benched() == []
+    group.close()
+
+def test_failed_backoff_does_not_overflow( sim):
+    sim( [ 0x10])
+    group = tfl.SensorGroup( [ 0x10], 4)
+    group.failures[ 0x10] = 100000
+    group._failed( group.sensors[ 0], tfl.TFL_I2CREAD, time.monotonic())
+    assert group.benched() == group.sensors
@@ -0,0 +1,44 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_scan.py
+# Description: Tests of the bus scan and of address
+#  provisioning.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import pytest
+import tfli2c as tfl
+
+def test_scan_every_port( sim):
+    sim( [ 0x10, 0x11], ports = ( 1, 4))
+    found = tfl.scan( [ 1, 4, 7])
+    assert sorted( ( f.port, f.addr) for f in found) ==\
+           [ ( 1, 0x10), ( 1, 0x11), ( 4, 0x10), ( 4, 0x11)]
+    assert all( f.prodCode == 'SIMLUNA0000001' and f.version == '3.2.1'
+                for f in found)
+
+def test_other_device_has_no_code( sim):
+    buses = sim( [ 0x10, 0x40])
+    code = tfl.TFL_PROD_CODE
+    buses[ 4].devices[ 1].regs[ code : code + 14] = bytes( range( 200, 214))
+    found = tfl.scanBus( 4)
+    assert [ ( f.addr, f.prodCode) for f in found] ==\
+           [ ( 0x10, 'SIMLUNA0000001'), ( 0x40, None)]
+
+def test_provision_one_device( sim):
+    buses = sim( [ 0x10, 0x11])
+    results = tfl.provision( 4)
+    assert [ ( r.addr, r.ok) for r in results] == [ ( 0x12, True)]
+    assert sorted( d.addr for d in buses[ 4].devices) == [ 0x11, 0x12]
+
+def test_provision_devices_sharing_an_address( sim):
+    buses = sim( [ 0x10, 0x10, 0x11])
+    shared = buses[ 4].devices[ : 2]
+    for device in shared:
+        device.offline = True
+    def connect( n):
+        shared[ n].offline = False
+    with pytest.raises( ValueError):
+        tfl.provision( 4, count = 2)
+    results = tfl.provision( 4, count = 2, connect = connect)
+    assert [ ( r.addr, r.ok) for r in results] == [ ( 0x12, True),
+                                                    ( 0x13, True)]
+    assert sorted( d.addr for d in buses[ 4].devices) == [ 0x11, 0x12, 0x13]
@@ -0,0 +1,80 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_scheduler.py
+# Description: Tests of the trigger schedulers.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import time
+
+import pytest
+import tfli2c as tfl
+
+def mode( device):
+    return device.regs[ tfl.TFL_SET_MODE]
+
+def test_trigger_scheduler_restores_mode( sim):
+    buses = sim( [ 0x10, 0x11])
+    devices = buses[ 4].devices
+    group = tfl.SensorGroup( [ 0x10, 0x11], 4)
+    group.sensors[ 0].setModeCont()
+    group.sensors[ 1].setModeTrig()
+    frames = tfl.TriggerScheduler( group, rate = 50).frames()
+    got = [ next( frames) for n in range( 6)]
+    assert [ mode( d) for d in devices] == [ 1, 1]
+    frames.close()
+    assert [ mode( d) for d in devices] == [ 0, 1]
+    assert { frame.addr for frame in got} == { 0x10, 0x11}
+    group.close()
+
+def test_trigger_scheduler_rate_too_fast( sim):
+    sim()
+    with pytest.raises( ValueError):
+        tfl.TriggerScheduler( [ tfl.TFLuna( 0x10, 4)], rate = 100)
+
+def test_adaptive_scheduler_slows_when_still( sim):
+    buses = sim( [ 0x10])
+    group = tfl.SensorGroup( [ 0x10], 4)
+    group.sensors[ 0].setModeCont()
+    sched = tfl.AdaptiveScheduler( group, rates = ( 100, 50), hold = 0.05)
+    frames = sched.frames()
+    deadline = time.monotonic() + 1
+    while sched.rate( group.sensors[ 0]) == 100 and time.monotonic() < deadline:
+        next( frames)
+    assert sched.rate( group.sensors[ 0]) == 50
+    assert mode( buses[ 4].devices[ 0]) == 1
+    frames.close()
+    assert mode( buses[ 4].devices[ 0]) == 0
+    group.close()
+
+#  Slow rates use low power mode, and motion ends it
+def test_adaptive_scheduler_low_power( sim):
+    buses = sim( [ 0x10])
+    device = buses[ 4].devices[ 0]
+    group = tfl.SensorGroup( [ 0x10], 4)
+    sensor = group.sensors[ 0]
+    sched = tfl.AdaptiveScheduler( group, rates = ( 50, 10), hold = 0.05)
+    frames = sched.frames()
+    deadline = time.monotonic() + 1
+    while sched.rate( sensor) == 50 and time.monotonic() < deadline:
+        next( frames)
+    assert device.regs[ tfl.TFL_SET_LO_PWR] == 1
+    device.dist = 200
+    while sched.rate( sensor) == 10 and time.monotonic() < deadline:
+        next( frames)
+    assert sched.rate( sensor) == 50
+    assert device.regs[ tfl.TFL_SET_LO_PWR] == 0
+    frames.close()
+    group.close()
+
+def test_adaptive_scheduler_turns_low_power_off( sim):
+    buses = sim( [ 0x10])
+    device = buses[ 4].devices[ 0]
+    group = tfl.SensorGroup( [ 0x10], 4)
+    sched = tfl.AdaptiveScheduler( group, rates = ( 50, 10), hold = 0.02)
+    frames = sched.frames()
+    deadline = time.monotonic() + 1
+    while not device.regs[ tfl.TFL_SET_LO_PWR] and time.monotonic() < deadline:
+        next( frames)
+    assert device.regs[ tfl.TFL_SET_LO_PWR] == 1
+    frames.close()
+    assert device.regs[ tfl.TFL_SET_LO_PWR] == 0
+    group.close()
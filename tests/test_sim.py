@@ -0,0 +1,57 @@
+'''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+# File Name: test_sim.py
+# Description: Tests of the simulated bus itself,
+#  `tfli2c.simulate()`, which the other tests run on.
+-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
+
+import time
+
+import pytest
+import tfli2c as tfl
+
+def test_trigger_latency_and_faults( sim):
+    buses = sim( latency = 0.02, dist = 300)
+    device = buses[ 4].devices[ 0]
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.setModeTrig()
+        sensor.setTrigger()
+        sensor.readData()
+        assert sensor.dist == 0            # not measured yet
+        time.sleep( 0.03)
+        sensor.readData()
+        assert sensor.dist == 300
+        device.offline = True
+        with pytest.raises( OSError):
+            sensor.readData()
+
+def test_save_and_reset( sim):
+    buses = sim()
+    with tfl.TFLuna( 0x10, 4) as sensor:
+        sensor.setI2Caddr( 0x30)
+        sensor.saveSettings()
+        time.sleep( 0.02)
+        sensor.softReset()
+        time.sleep( 0.03)
+    assert buses[ 4].devices[ 0].addr == 0x30
+    with tfl.TFLuna( 0x30, 4) as sensor:
+        sensor.hardReset()
+    time.sleep( 0.05)
+    assert buses[ 4].devices[ 0].addr == 0x10
+
+def test_unknown_port_and_address( sim):
+    buses = sim()
+    with pytest.raises( FileNotFoundError):
+        tfl.openBus( 7)
+    with pytest.raises( OSError):
+        buses[ 4].read_byte_data( 0x22, 0)
+
+def test_fail_rate( sim):
+    buses = sim( failRate = 0.5, seed = 3)
+    failed = 0
+    for n in range( 200):
+        try:
+            buses[ 4].read_byte_data( 0x10, tfl.TFL_SET_MODE)
+        except OSError:
+            failed += 1
+    assert 60 < failed < 140
+    assert buses[ 4].devices[ 0].transactions == 200 - failed
@@ -22,8 +22,9 @@
 #  Continuous ranging is not recommended in I2C mode and so
 #  this function also sets the device to single sample mode.
 
-# NOTE:  Additional instances of this module (tfl2, tfl3,
-# etc) should be imported to control additional devices.
+# NOTE:  Additional devices are controlled with a `TFLuna`
+# object for each device, or with a `SensorGroup` that
+# reads several devices on one shared bus.
 
 # 'getData()' sets module variables for dist(distance),
 #  flux (signal strength) and temp(temperature in Centigrade).
@@ -79,9 +80,11 @@ else:
 #
 #  - - Perform a system reset - - - - - - - -
 print( "System reset: ", end = '')
-tfl.softReset()
-time.sleep(0.5)  # allow 500ms for reset to complete
-print( "complete")
+#  Wait until the device answers again instead of a fixed delay
+if tfl.softReset( wait = True):
+    print( "complete")
+else:
+    print( "no answer")
 #
 #  - - Get and Display the firmware version - - - - - - -
 print( "Firmware version: " + tfl.getFirmwareVersion())
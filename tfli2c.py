@@ -17,7 +17,7 @@
  #  sets device sampling to `trigger` mode
  #
  #  getData()
- #  reads first six registers of device and
+ #  reads first eight registers of device and
  #  sets the value of three variables
     -  dist : distance measured by the device, in cm
     -  flux : signal strength, quality or confidence
@@ -32,10 +32,47 @@
  #  the `set` commmands require a follow-on `saveSettings`
  #  and `softReset` commands.
  #
+ #  TFLuna( addr, port)
+ #  is a device object that opens the I2C bus once and
+ #  keeps the handle until `close()` is called. It has
+ #  all of the commands above as methods and may be used
+ #  as a context manager:
+ #      with TFLuna( 0x10, 4) as tfl:
+ #          tfl.getData()
+ #  The module level functions are thin wrappers around
+ #  a default `TFLuna` device created by `begin()`.
+ #
 =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
 
+import os
+import sys
+import json
 import time
-from smbus import SMBus
+import heapq
+import queue
+import mmap
+import ctypes
+import struct
+import array
+import errno
+import random
+import asyncio
+import threading
+import warnings
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from smbus import SMBus
+except ImportError:         # no I2C support here, e.g. Windows
+    SMBus = None
+
+try:
+    import numpy            # optional, for NumPy views of samples
+except ImportError:
+    numpy = None
+
+__version__ = '0.0.1'
 
 status = 0            # error status code
 dist =   0            # distance to target
@@ -52,20 +89,158 @@ tflAddr = 0x10        # TFLuna I2C device address
 tflPort = 4           # Raspberry Pi I2C port number
                       # 4 = /dev/i2c-4, GPIO 8/9, pins 24/21
 
+device = None         # default `TFLuna` used by the module functions
+
+TFL_FRAME_TIME = 0.01 # one measurement period at the default 100fps
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+#      I2C bus backend
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  Buses are opened by calling `busFactory( port)`.  The
+#  default is `smbus.SMBus`.  Any object with the same
+#  methods can be used instead:
+#      write_quick( addr)
+#      read_byte_data( addr, reg)
+#      write_byte_data( addr, reg, value)
+#      read_word_data( addr, reg)
+#      write_word_data( addr, reg, value)
+#      read_i2c_block_data( addr, reg, length)
+#      close()
+#  Errors are raised as `OSError`, as `smbus` does.
+busFactory = SMBus
+
+def setBackend( factory):
+    ''' Set the function that opens a bus for a port '''
+    global busFactory
+    busFactory = factory
+
+def openBus( port):
+    ''' Open the I2C bus for a port with the current backend '''
+    if busFactory is None:
+        raise ImportError( "tfli2c needs the `smbus` module, " +
+                           "or a backend set by `setBackend()`")
+    bus = busFactory( port)
+    if stats is not None:
+        bus = InstrumentedBus( bus, stats)
+    return bus
+
+stats = None          # `Stats` while instrumentation is on (`instrument()`)
+
+#  - - - -  I2C_RDWR backend, without smbus  - - - -
+#  `RdwrBus` talks to `/dev/i2c-N` directly with the
+#  kernel's I2C_RDWR ioctl, so it needs no `smbus` module.
+#  Besides the usual SMBus methods it has two batch
+#  methods that put many messages, for many devices, into
+#  one combined transfer, which is one system call:
+#      writeMany( [ ( addr, reg, value), ...])
+#      readMany( [ ( addr, reg, length), ...])
+#  `SensorGroup` uses them to send every trigger in one
+#  call and read every frame back in another.  If any
+#  device does not answer, the whole call fails.  To use
+#  it for every bus:
+#      tfl.setBackend( tfl.RdwrBus)
+I2C_RDWR = 0x0707           # ioctl request number
+I2C_M_RD = 0x0001           # message flag: read from the device
+I2C_RDWR_MAX_MSGS = 42      # kernel limit of messages per call
+
+class _I2cMsg( ctypes.Structure):
+    _fields_ = [ ( 'addr', ctypes.c_uint16), ( 'flags', ctypes.c_uint16),
+                 ( 'len', ctypes.c_uint16), ( 'buf', ctypes.c_void_p)]
+
+class _I2cRdwrData( ctypes.Structure):
+    _fields_ = [ ( 'msgs', ctypes.POINTER( _I2cMsg)),
+                 ( 'nmsgs', ctypes.c_uint32)]
+
+class RdwrBus:
+    ''' I2C bus using combined I2C_RDWR transfers '''
+
+    def __init__( self, port = 4):
+        import fcntl
+        self.ioctl = fcntl.ioctl
+        self.port = port
+        self.fd = os.open( f"/dev/i2c-{port}", os.O_RDWR)
+
+    def __repr__( self):
+        return f"RdwrBus(port={self.port})"
+
+    def close( self):
+        if self.fd is not None:
+            os.close( self.fd)
+            self.fd = None
+
+    #  - - - -  One combined transfer  - - - -
+    #  `msgs` is a list of ( addr, read, data) where `data`
+    #  is the bytes to write, or the number of bytes to read.
+    #  Return the data of every read message, in order.
+    #  Longer lists are split at the kernel limit, which is
+    #  even, so a register write and its read stay together.
+    def transfer( self, msgs):
+        results = []
+        for first in range( 0, len( msgs), I2C_RDWR_MAX_MSGS):
+            part = msgs[ first : first + I2C_RDWR_MAX_MSGS]
+            structs = ( _I2cMsg * len( part))()
+            buffers = []
+            for msg, ( addr, read, data) in zip( structs, part):
+                if read:
+                    buf = ctypes.create_string_buffer( data)
+                else:
+                    buf = ctypes.create_string_buffer( bytes( data), len( data))
+                buffers.append( ( read, buf))
+                msg.addr = addr
+                msg.flags = I2C_M_RD if read else 0
+                msg.len = len( buf)
+                msg.buf = ctypes.addressof( buf)
+            request = _I2cRdwrData( structs, len( part))
+            self.ioctl( self.fd, I2C_RDWR, request)
+            results += [ list( buf.raw) for read, buf in buffers if read]
+        return results
+
+    #  - - - -  The SMBus methods  - - - -
+    def write_quick( self, addr):
+        self.transfer( [ ( addr, False, b'')])
+
+    def read_byte_data( self, addr, reg):
+        return self.transfer( [ ( addr, False, [ reg]), ( addr, True, 1)])[ 0][ 0]
+
+    def write_byte_data( self, addr, reg, value):
+        self.transfer( [ ( addr, False, [ reg, value & 0xFF])])
+
+    def read_word_data( self, addr, reg):
+        lo, hi = self.transfer( [ ( addr, False, [ reg]), ( addr, True, 2)])[ 0]
+        return lo + ( hi << 8)
+
+    def write_word_data( self, addr, reg, value):
+        self.transfer( [ ( addr, False, [ reg, value & 0xFF,
+                                          ( value >> 8) & 0xFF])])
+
+    def read_i2c_block_data( self, addr, reg, length = 32):
+        return self.transfer( [ ( addr, False, [ reg]),
+                                ( addr, True, length)])[ 0]
+
+    def write_i2c_block_data( self, addr, reg, data):
+        self.transfer( [ ( addr, False, [ reg] + list( data))])
+
+    #  - - - -  Batches for many devices  - - - -
+    def writeMany( self, items):
+        ''' Write one register on each of many devices '''
+        self.transfer( [ ( addr, False, [ reg, value & 0xFF])
+                         for addr, reg, value in items])
+
+    def readMany( self, items):
+        ''' Read a block of registers from each of many devices '''
+        msgs = []
+        for addr, reg, length in items:
+            msgs += [ ( addr, False, [ reg]), ( addr, True, length)]
+        return self.transfer( msgs)
+
 def begin( addr, port):
-    global tflPort, tflAddr
+    global tflPort, tflAddr, device
     tflAddr = addr    # re-assign device address
     tflPort = port    # re-assign port number
-    try:
-        bus = SMBus( tflPort)
-        bus.open( tflPort)        #  Open I2C communication
-        bus.write_quick( tflAddr) #  Short test transaction
-        # Set device to single-shot/trigger mode
-        bus.write_byte_data( tflAddr, TFL_SET_MODE, 1)
-        bus.close()               #  Close I2C communication
-        return True
-    except Exception:
-        return False
+    if device is not None:
+        device.close()            #  Release the previous bus handle
+    device = TFLuna( tflAddr, tflPort)
+    return device.begin()
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 #      Definitions
@@ -120,6 +295,2817 @@ TFL_FLOOD         = 12  # Ambient Light saturation
 TFL_MEASURE       = 13
 TFL_INVALID       = 14  # Invalid operation sent to sendCommand()
 
+# - -   Status code names used by `printStatus()`  - -
+TFL_STATUS_TEXT = {
+    TFL_READY:     "READY",
+    TFL_SERIAL:    "SERIAL",
+    TFL_HEADER:    "HEADER",
+    TFL_CHECKSUM:  "CHECKSUM",
+    TFL_TIMEOUT:   "TIMEOUT",
+    TFL_PASS:      "PASS",
+    TFL_FAIL:      "FAIL",
+    TFL_I2CREAD:   "I2C-READ",
+    TFL_I2CWRITE:  "I2C-WRITE",
+    TFL_I2CLENGTH: "I2C-LENGTH",
+    TFL_WEAK:      "Signal weak",
+    TFL_STRONG:    "Signal saturation",
+    TFL_FLOOD:     "Ambient light saturation",
+}
+
+
+# - - -  One measurement from one device  - - -
+#  `temp` is in degrees Celsius and `status` is
+#  one of the status codes defined above.  `tick` is
+#  the device clock in milliseconds, if it was read, and
+#  `time` is the host `time.monotonic()` at which the
+#  measurement was made, worked out from the tick.
+Frame = namedtuple( 'Frame', 'addr dist flux temp status tick time',
+                    defaults = ( None, None))
+
+
+# - - -  Decoded copy of the whole register map  - - -
+TFL_REG_COUNT = 0x2A       # registers 0x00 to 0x29
+Snapshot = namedtuple( 'Snapshot', 'dist flux temp tick error version ' +
+                       'prodCode addr mode enable fps lowPower')
+
+#  Decode a list of the 42 register values into a `Snapshot`
+def decodeRegisters( regs):
+    ''' Decode the register map '''
+    word = lambda reg: regs[ reg] + ( regs[ reg + 1] << 8)
+    return Snapshot(
+        dist     = word( TFL_DIST_LO),
+        flux     = word( TFL_FLUX_LO),
+        temp     = word( TFL_TEMP_LO) / 100,
+        tick     = word( TFL_TICK_LO),
+        error    = word( TFL_ERR_LO),
+        version  = f"{regs[ TFL_VER_MAJ]}.{regs[ TFL_VER_MIN]}." +
+                   f"{regs[ TFL_VER_REV]}",
+        prodCode = ''.join( chr( c) for c in
+                            regs[ TFL_PROD_CODE : TFL_PROD_CODE + 14]),
+        addr     = regs[ TFL_SET_I2C_ADDR],
+        mode     = 'continuous' if regs[ TFL_SET_MODE] == 0 else 'trigger',
+        enable   = regs[ TFL_DISABLE] == 0,
+        fps      = word( TFL_FPS_LO),
+        lowPower = regs[ TFL_SET_LO_PWR] == 1)
+
+
+# - - -  Settings that `apply()` can change  - - -
+TFL_SETTINGS = ( 'addr', 'mode', 'enable', 'fps', 'lowPower')
+
+#  Result of `apply()`: the device address afterwards,
+#  the settings that were changed and whether the device
+#  came back with all of the wanted settings
+Applied = namedtuple( 'Applied', 'addr changed ok')
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#             EVALUATE A DATA FRAME
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  Return the status code for a distance and flux pair
+def evalData( dist, flux):
+    ''' Classify abnormal data values '''
+    if( dist == -1):
+        return TFL_WEAK
+    elif( flux < 100):         # Signal strength < 100
+        return TFL_WEAK
+    elif( flux > 0x8000):      # Ambient light too strong
+        return TFL_FLOOD
+    elif( flux == 0xFFFF):     # Signal saturation
+        return TFL_STRONG
+    return TFL_READY
+
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#               DEVICE CLOCK TO HOST TIME
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  The tick registers count milliseconds on the device's
+#  own clock and are set with each measurement, so a
+#  tick read in the same block as the distance is the
+#  exact capture time, in device time.  It wraps every
+#  65.536 seconds.  `TickClock` maps it to host time:
+#    - ticks are unwrapped into device seconds, using the
+#      host time between reads to count any wraps missed
+#      during a long gap
+#    - the measurement was made before the read started,
+#      so host time at the start of the read minus device
+#      time is never less than the true offset.  If the
+#      time of the trigger is known, the measurement was
+#      made after it, which bounds the offset from below.
+#    - in each `window` seconds only the tightest bounds
+#      are kept, which throws away the bus and scheduling
+#      delays, and their midpoint is taken as the offset
+#    - a line through the last `windows` of these points
+#      gives the offset and the drift of the device clock
+#  A tick that does not fit the host time, because the
+#  device was reset, starts a new estimate.
+class TickClock:
+    ''' Map device ticks to host monotonic time '''
+
+    def __init__( self, window = 2.0, windows = 16):
+        self.window = window      # seconds per fitted point
+        self.windows = windows    # points in the fit
+        self.reset()
+
+    def reset( self):
+        self.last = None          # last tick, as read
+        self.lastHost = 0.0       # host time of the last read
+        self.device = 0.0         # unwrapped device seconds
+        self.points = deque( maxlen = self.windows)
+        self.start = 0.0          # device time this window began
+        self.upper = None         # ( device, smallest host - device)
+        self.lower = None         # ( device, largest trigger - device)
+        self.offset = 0.0         # host - device at device time `ref`
+        self.ref = 0.0
+        self.drift = 0.0          # device clock rate error, s/s
+
+    #  Add a tick read at host time `host`, taken just
+    #  before the read, and return its host capture time.
+    #  `trigger` is the host time just before the trigger
+    #  that started this measurement, if there was one.
+    def update( self, tick, host, trigger = None):
+        ''' Add a tick and return its host time '''
+        if self.last is not None:
+            elapsed = ( host - self.lastHost) * 1000
+            step = ( tick - self.last) & 0xFFFF
+            step += int( round( ( elapsed - step) / 65536)) * 65536
+            if step < 0 or abs( step - elapsed) > 1000 + elapsed / 100:
+                self.reset()
+            elif step == 0:
+                trigger = None        # not a new measurement
+            else:
+                self.device += step / 1000
+        self.last = tick
+        self.lastHost = host
+
+        device = self.device
+        if self.upper is None or device - self.start >= self.window:
+            if self.upper is not None:
+                self.points.append( self._point())
+            self.start = device
+            self.upper = self.lower = None
+        changed = False
+        if self.upper is None or host - device < self.upper[ 1]:
+            self.upper = ( device, host - device)
+            changed = True
+        if trigger is not None and trigger <= host and\
+           ( self.lower is None or trigger - device > self.lower[ 1]):
+            self.lower = ( device, trigger - device)
+            changed = True
+        if changed:
+            self._fit()
+        return self.time( device)
+
+    #  The offset for the current window
+    def _point( self):
+        if self.lower is None or self.lower[ 1] > self.upper[ 1]:
+            return self.upper
+        return ( self.upper[ 0], ( self.upper[ 1] + self.lower[ 1]) / 2)
+
+    #  Fit a line through the points by least squares
+    def _fit( self):
+        points = list( self.points)
+        points.append( self._point())
+        n = len( points)
+        ref = sum( p[ 0] for p in points) / n
+        mean = sum( p[ 1] for p in points) / n
+        span = sum( ( p[ 0] - ref) ** 2 for p in points)
+        slope = 0.0
+        if span > 0:
+            slope = sum( ( p[ 0] - ref) * ( p[ 1] - mean)
+                         for p in points) / span
+        self.ref = ref
+        self.offset = mean
+        self.drift = -slope
+
+    #  Host monotonic time of unwrapped device time `device`
+    def time( self, device):
+        ''' Convert device seconds to host time '''
+        return device + self.offset - self.drift * ( device - self.ref)
+
+#  Wall clock `time.time()` of a `time.monotonic()` value,
+#  such as a frame's capture time, or of now if it is None
+def _wallTime( monotonic = None):
+    now = time.time()
+    if monotonic is None:
+        return now
+    return now - time.monotonic() + monotonic
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#               BATCH RAW FRAME DECODING
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  `RawFrames` decodes many raw frames at once, as read by
+#  `getRaw()`: six bytes of dist, flux and temp, or eight
+#  bytes with the tick as well, all little-endian uint16.
+#  With NumPy the columns are views of the raw bytes,
+#  made with `frombuffer`; without it they are decoded
+#  with `struct`.  Nothing else is computed until it is
+#  asked for: `status` classifies every frame like
+#  `evalData()` and `temp` converts to degrees Celsius,
+#  each on first use.
+#      raw = tfl.RawFrames( b''.join( blocks))
+#      near = raw.dist < 50
+#
+#  `SensorGroup.getRaw()` returns a `RawRound`: the joined
+#  frames of every device and a list of the status of each
+#  read (`TFL_READY`, `TFL_I2CWRITE`, `TFL_I2CREAD` or
+#  `TFL_FAIL`), in device order.
+RawRound = namedtuple( 'RawRound', 'data status')
+
+class RawFrames:
+    ''' Column view of many raw frames '''
+
+    def __init__( self, data, size = 6):
+        if not isinstance( data, ( bytes, bytearray, memoryview)):
+            data = b''.join( bytes( block) for block in data)
+        self.size = size
+        self.count = len( data) // size
+        data = data[ : self.count * size]
+        if numpy is not None:
+            words = numpy.frombuffer( data, '<u2').reshape( self.count, size // 2)
+            columns = [ words[ :, i] for i in range( size // 2)]
+        else:
+            columns = [ array.array( 'H', column) for column in
+                        zip( *struct.iter_unpack( f"<{size // 2}H", data))]
+            columns = columns or [ array.array( 'H')] * ( size // 2)
+        self.dist, self.flux, self.tempRaw = columns[ : 3]
+        self.tick = columns[ 3] if size >= 8 else None
+        self._status = None
+        self._temp = None
+
+    def __repr__( self):
+        return f"RawFrames({self.count} frames of {self.size} bytes)"
+
+    def __len__( self):
+        return self.count
+
+    #  - - - -  Computed on first use  - - - -
+    @property
+    def status( self):
+        ''' Status code of every frame '''
+        if self._status is None:
+            self._status = classify( self.dist, self.flux)
+        return self._status
+
+    @property
+    def temp( self):
+        ''' Temperature of every frame in degrees Celsius '''
+        if self._temp is None:
+            if numpy is not None:
+                self._temp = self.tempRaw / 100
+            else:
+                self._temp = array.array( 'd', ( t / 100 for t in self.tempRaw))
+        return self._temp
+
+#  - - - -  Status codes for many frames at once  - - - -
+#  The same tests as `evalData()`, on whole columns
+def classify( dist, flux):
+    ''' Return the status code of every frame '''
+    if numpy is None:
+        return array.array( 'B', map( evalData, dist, flux))
+    dist = numpy.asarray( dist)
+    flux = numpy.asarray( flux)
+    return numpy.select(
+        [ dist == -1, flux < 100, flux > 0x8000, flux == 0xFFFF],
+        [ TFL_WEAK, TFL_WEAK, TFL_FLOOD, TFL_STRONG],
+        TFL_READY).astype( numpy.uint8)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#                 SAMPLE RING BUFFER
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  A `SampleBuffer` keeps the latest `capacity` samples
+#  in one compact typed array per column.  Its memory is
+#  allocated once, so it stays flat however long it runs.
+#  Every sample is written twice, at `i` and at
+#  `i + capacity`, so the latest N samples are always one
+#  contiguous slice and can be returned as memoryviews
+#  without copying.  The views are live: they see the
+#  buffer's memory, and their values are overwritten once
+#  another `capacity - N` samples have been appended.
+Samples = namedtuple( 'Samples', 'time tick dist flux tempRaw status')
+
+class SampleBuffer:
+    ''' Fixed capacity ring buffer of samples '''
+
+    #  Column names and `array` type codes
+    columns = ( ( 'time', 'd'),      # host clock, seconds
+                ( 'tick', 'H'),      # device clock, milliseconds
+                ( 'dist', 'H'),      # centimeters
+                ( 'flux', 'H'),      # signal strength
+                ( 'tempRaw', 'H'),   # hundredths of a degree C
+                ( 'status', 'B'))    # status code
+
+    def __init__( self, capacity = 1024):
+        self.capacity = capacity
+        self.count = 0               # total samples ever appended
+        self.data = [ array.array( code, bytes( 2 * capacity *
+                                   array.array( code).itemsize))
+                      for name, code in self.columns]
+
+    def __repr__( self):
+        return f"SampleBuffer({len(self)}/{self.capacity})"
+
+    def __len__( self):
+        return min( self.count, self.capacity)
+
+    #  - - - -  Append one sample  - - - -
+    def append( self, stamp, tick, dist, flux, tempRaw, status):
+        i = self.count % self.capacity
+        j = i + self.capacity
+        for column, value in zip( self.data,
+                                  ( stamp, tick, dist, flux, tempRaw, status)):
+            column[ i] = value
+            column[ j] = value
+        self.count += 1
+
+    #  - - - -  Zero-copy views of the latest samples  - - - -
+    #  Return the latest `n` samples, oldest first, as a
+    #  `Samples` record of memoryviews, one per column.
+    def latest( self, n = None):
+        ''' Return views of the latest `n` samples '''
+        count = self.count               # one consistent end point
+        size = min( count, self.capacity)
+        n = size if n is None else min( n, size)
+        end = ( count - 1) % self.capacity + self.capacity + 1
+        return Samples( *( memoryview( column)[ end - n : end]
+                           for column in self.data))
+
+    #  Same as `latest()` but as NumPy arrays sharing the
+    #  buffer's memory.  Requires the `numpy` module.
+    def arrays( self, n = None):
+        ''' Return NumPy views of the latest `n` samples '''
+        if numpy is None:
+            raise ImportError( "SampleBuffer.arrays() requires numpy")
+        return Samples( *( numpy.asarray( view) for view in self.latest( n)))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#               BINARY FRAME RECORDING
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  A `Recorder` writes frames as fixed size, little-endian
+#  binary records into a directory of chunk files:
+#      recorder = tfl.Recorder( 'run1')
+#      recorder.addFrame( frame)
+#      recorder.close()
+#  Each record is 18 bytes: host time (float64 seconds),
+#  device tick, dist, flux, tempRaw (uint16 each), status
+#  and sensor id (uint8 each).  Each chunk file starts with
+#  a 32 byte header: magic, format version, record size and
+#  the time of its first record.  A chunk holds at most
+#  `chunkRecords` records, and `index.json` lists the
+#  chunks with their record count and first and last time.
+#  The record count of a chunk is also known from its file
+#  size, so a chunk that was not closed cleanly is read,
+#  and a new `Recorder` on the same path adds it to the
+#  index and starts a new chunk after it.
+TFL_REC_MAGIC   = b'TFLREC\0\0'
+TFL_REC_VERSION = 1
+TFL_REC_HEADER  = struct.Struct( '<8sHHId8x')     # 32 bytes
+TFL_REC_RECORD  = struct.Struct( '<dHHHHBB')      # 18 bytes
+TFL_REC_FIELDS  = ( 'time', 'tick', 'dist', 'flux', 'tempRaw',
+                    'status', 'sensor')
+
+class Recorder:
+    ''' Write frames to binary chunk files '''
+
+    def __init__( self, path, chunkRecords = 1 << 20):
+        self.path = path
+        self.chunkRecords = chunkRecords
+        os.makedirs( path, exist_ok = True)
+        self.index = _readIndex( path)
+        orphans = _orphans( path, self.index)   # left by an unclean stop
+        if orphans:
+            self.index.extend( orphans)
+            _writeIndex( path, self.index)
+        self.file = None
+        self.count = 0             # records in the current chunk
+        self.first = self.last = None
+
+    def __repr__( self):
+        return f"Recorder({self.path!r})"
+
+    def __enter__( self):
+        return self
+
+    def __exit__( self, *exc):
+        self.close()
+
+    #  - - - -  Add one record  - - - -
+    def add( self, stamp, tick, dist, flux, tempRaw, status, sensor):
+        if self.file is None or self.count >= self.chunkRecords:
+            self._newChunk( stamp)
+        self.file.write( TFL_REC_RECORD.pack( stamp, tick, dist, flux,
+                                              tempRaw, status, sensor))
+        self.count += 1
+        self.last = stamp
+
+    #  Add a `Frame`, by default stamped with its capture
+    #  time (or now, if it has none) and with its device
+    #  address as the sensor id.
+    def addFrame( self, frame, stamp = None, sensor = None):
+        self.add( _wallTime( frame.time) if stamp is None else stamp,
+                  frame.tick or 0, frame.dist, frame.flux,
+                  int( round( frame.temp * 100)) & 0xFFFF, frame.status,
+                  frame.addr if sensor is None else sensor)
+
+    def _newChunk( self, stamp):
+        self._closeChunk()
+        numbers = [ int( name[ 6:-4]) for name in os.listdir( self.path)
+                    if name.startswith( 'chunk-') and name.endswith( '.tfr')
+                    and name[ 6:-4].isdigit()]
+        name = f"chunk-{max( numbers, default = -1) + 1:06d}.tfr"
+        self.file = open( os.path.join( self.path, name), 'xb')
+        self.file.write( TFL_REC_HEADER.pack( TFL_REC_MAGIC, TFL_REC_VERSION,
+                                              TFL_REC_RECORD.size, 0, stamp))
+        self.index.append( { 'file': name, 'count': 0,
+                             'first': stamp, 'last': stamp})
+        self.count = 0
+
+    #  Write the record count into the chunk header and
+    #  the chunk into the index
+    def _closeChunk( self):
+        if self.file is None:
+            return
+        self.file.seek( 12)
+        self.file.write( struct.pack( '<I', self.count))
+        self.file.close()
+        self.file = None
+        self.index[ -1].update( count = self.count, last = self.last)
+        _writeIndex( self.path, self.index)
+
+    def flush( self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close( self):
+        self._closeChunk()
+
+def _readIndex( path):
+    try:
+        with open( os.path.join( path, 'index.json')) as file:
+            return json.load( file)
+    except FileNotFoundError:
+        return []
+
+#  Index entries for the chunk files that are not in
+#  `index`, with the record count and times read from
+#  the files themselves
+def _orphans( path, index):
+    names = { entry[ 'file'] for entry in index}
+    entries = []
+    for name in sorted( os.listdir( path)):
+        if not name.endswith( '.tfr') or name in names:
+            continue
+        entry = { 'file': name, 'count': 0, 'first': None, 'last': None}
+        with open( os.path.join( path, name), 'rb') as file:
+            data = file.read()
+        if len( data) >= TFL_REC_HEADER.size:
+            entry[ 'first'] = TFL_REC_HEADER.unpack_from( data)[ 4]
+            count = ( len( data) - TFL_REC_HEADER.size) // TFL_REC_RECORD.size
+            entry[ 'count'] = count
+            entry[ 'last'] = entry[ 'first']
+            if count:
+                entry[ 'last'] = TFL_REC_RECORD.unpack_from( data,
+                    TFL_REC_HEADER.size + ( count - 1) * TFL_REC_RECORD.size)[ 0]
+        entries.append( entry)
+    return entries
+
+def _writeIndex( path, index):
+    temp = os.path.join( path, 'index.json.tmp')
+    with open( temp, 'w') as file:
+        json.dump( index, file, indent = 1)
+    os.replace( temp, os.path.join( path, 'index.json'))
+
+#  A `RecordReader` memory-maps the chunks of a recording.
+#  `chunks()` returns one NumPy structured array for each
+#  chunk, backed directly by the file, so nothing is parsed
+#  or copied until it is used.  `read( start, end)` returns
+#  the records between two host times as one array.
+#  Without NumPy, `records()` yields plain tuples.
+class RecordReader:
+    ''' Read binary chunk files by memory mapping '''
+
+    def __init__( self, path):
+        self.path = path
+        self.index = _readIndex( path)
+        self.index.extend( _orphans( path, self.index))  # not in the index
+
+    def __repr__( self):
+        return f"RecordReader({self.path!r}, chunks={len(self.index)})"
+
+    def __len__( self):
+        return sum( self._count( entry) for entry in self.index)
+
+    def _count( self, entry):
+        size = os.path.getsize( os.path.join( self.path, entry[ 'file']))
+        return max( size - TFL_REC_HEADER.size, 0) // TFL_REC_RECORD.size
+
+    @staticmethod
+    def dtype():
+        ''' NumPy dtype of one record '''
+        return numpy.dtype( [ ( 'time', '<f8'), ( 'tick', '<u2'),
+                              ( 'dist', '<u2'), ( 'flux', '<u2'),
+                              ( 'tempRaw', '<u2'), ( 'status', 'u1'),
+                              ( 'sensor', 'u1')])
+
+    def _map( self, entry):
+        count = self._count( entry)
+        if not count:
+            return numpy.zeros( 0, self.dtype())
+        return numpy.memmap( os.path.join( self.path, entry[ 'file']),
+                             self.dtype(), 'r', TFL_REC_HEADER.size, ( count,))
+
+    #  - - - -  One memory-mapped array per chunk  - - - -
+    def chunks( self, start = None, end = None):
+        ''' Return NumPy views of the chunks, in time order '''
+        if numpy is None:
+            raise ImportError( "RecordReader.chunks() requires numpy")
+        views = []
+        for entry in self.index:
+            if entry[ 'first'] is not None and entry[ 'last'] is not None:
+                if end is not None and entry[ 'first'] > end:
+                    continue
+                if start is not None and entry[ 'last'] < start:
+                    continue
+            views.append( self._map( entry))
+        return views
+
+    #  Records with `start <= time <= end`, as one array
+    def read( self, start = None, end = None):
+        ''' Return the records between two host times '''
+        parts = []
+        for view in self.chunks( start, end):
+            keep = numpy.ones( len( view), bool)
+            if start is not None:
+                keep &= view[ 'time'] >= start
+            if end is not None:
+                keep &= view[ 'time'] <= end
+            parts.append( view if keep.all() else view[ keep])
+        if not parts:
+            return numpy.zeros( 0, self.dtype())
+        return parts[ 0] if len( parts) == 1 else numpy.concatenate( parts)
+
+    #  Plain tuples, for use without NumPy
+    def records( self):
+        ''' Yield every record as a tuple '''
+        for entry in self.index:
+            count = self._count( entry)
+            if not count:
+                continue
+            with open( os.path.join( self.path, entry[ 'file']), 'rb') as file,\
+                 mmap.mmap( file.fileno(), 0, access = mmap.ACCESS_READ) as data:
+                end = TFL_REC_HEADER.size + count * TFL_REC_RECORD.size
+                yield from TFL_REC_RECORD.iter_unpack(
+                    data[ TFL_REC_HEADER.size : end])
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#                 BATCH SIGNAL FILTER
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  A `SignalFilter` smooths batches of distance samples
+#  for many sensors at once with NumPy.  A batch is an
+#  array with one row for each sensor and one column for
+#  each sample (or a flat array for a single sensor).
+#  The stages run in this order, and each is skipped if
+#  its setting is left at the default:
+#    - flux rejection: samples with flux below `minFlux`
+#      or above `maxFlux` become NaN, like `evalData()`
+#    - rolling median over `median` samples
+#    - exponential moving average with weight `alpha`
+#    - 1-D Kalman filter with process noise `q` and
+#      measurement noise `r`, scaled by `fluxRef / flux`
+#      so that weak returns count for less
+#  Filter state is carried from one batch to the next,
+#  so a continuous signal can be fed in any batch size.
+#  Rejected samples hold the last estimate in the EMA
+#  and Kalman stages.  Requires the `numpy` module.
+class SignalFilter:
+    ''' Vectorized noise filter for batches of samples '''
+
+    def __init__( self, sensors = 1, minFlux = 100, maxFlux = 0x8000,
+                  median = 0, alpha = None, q = None, r = None,
+                  fluxRef = 1000):
+        if numpy is None:
+            raise ImportError( "SignalFilter requires numpy")
+        self.sensors = sensors
+        self.minFlux = minFlux
+        self.maxFlux = maxFlux
+        self.median = median
+        self.alpha = alpha
+        self.q = q
+        self.r = r
+        self.fluxRef = fluxRef
+        self.reset()
+
+    def reset( self):
+        ''' Forget all filter state '''
+        shape = ( self.sensors,)
+        self.history = numpy.full( ( self.sensors, max( self.median - 1, 0)),
+                                   numpy.nan)
+        self.average = numpy.full( shape, numpy.nan)    # EMA state
+        self.estimate = numpy.full( shape, numpy.nan)   # Kalman state
+        self.variance = numpy.zeros( shape)
+
+    #  - - - -  Run every stage over one batch  - - - -
+    def process( self, dist, flux):
+        ''' Filter one batch and return the result '''
+        dist = numpy.asarray( dist)
+        shape = dist.shape
+        dist = dist.reshape( self.sensors, -1)
+        flux = numpy.asarray( flux).reshape( self.sensors, -1)
+
+        out = self.reject( dist, flux)
+        if self.median > 1:
+            out = self.rollingMedian( out)
+        if self.alpha is not None:
+            out = self.ema( out)
+        if self.q is not None and self.r is not None:
+            out = self.kalman( out, flux)
+        return out.reshape( shape)
+
+    #  - - - -  Flux rejection  - - - -
+    def reject( self, dist, flux):
+        bad = ( flux < self.minFlux) | ( flux > self.maxFlux)
+        return numpy.where( bad, numpy.nan, dist.astype( float))
+
+    #  - - - -  Rolling median  - - - -
+    #  The last `median - 1` samples of each batch are kept
+    #  to fill the window at the start of the next batch.
+    def rollingMedian( self, x):
+        if not x.shape[ 1]:
+            return x.copy()
+        data = numpy.concatenate( ( self.history, x), axis = 1)
+        self.history = data[ :, data.shape[ 1] - self.history.shape[ 1]:]
+        windows = numpy.lib.stride_tricks.sliding_window_view(
+                      data, self.median, axis = 1)
+        with warnings.catch_warnings():      # all-NaN windows stay NaN
+            warnings.simplefilter( 'ignore', RuntimeWarning)
+            return numpy.nanmedian( windows, axis = 2)
+
+    #  - - - -  Exponential moving average  - - - -
+    #  Each sample is one step `avg = c * avg + b`: a kept
+    #  sample has c = 1 - alpha and b = alpha * value, a
+    #  rejected one leaves the average as it is (c = 1,
+    #  b = 0), and the first sample starts it (c = 0,
+    #  b = value).  The steps run along the samples with
+    #  `_linearScan()`, for every sensor at once.
+    def ema( self, x):
+        if not x.shape[ 1]:
+            return x.copy()
+        seen, start, before = self._starts( x, self.average)
+        c = numpy.where( seen, 1 - self.alpha, 1.0)
+        b = numpy.where( seen, self.alpha * x, 0.0)
+        if start is not None:
+            c[ start] = 0.0
+            b[ start] = x[ start]
+        out = _linearScan( c, b, numpy.nan_to_num( self.average))
+        if before is not None:
+            out[ before] = numpy.nan
+        self.average = out[ :, -1]
+        return out
+
+    #  Which samples are kept, which one is the first ever
+    #  for a sensor whose `state` is still NaN, and which
+    #  come before that one (None once every sensor started)
+    def _starts( self, x, state):
+        seen = ~numpy.isnan( x)
+        fresh = numpy.isnan( state)
+        if not fresh.any():
+            return seen, None, None
+        count = numpy.cumsum( seen, axis = 1)
+        fresh = fresh[ :, None]
+        return seen, seen & fresh & ( count == 1), fresh & ( count == 0)
+
+    #  - - - -  1-D Kalman filter  - - - -
+    #  Random walk model: the predicted variance grows by
+    #  `q` each sample and each measurement has variance
+    #  `r * fluxRef / flux`.  The variance does not depend
+    #  on the distances, and each step of it is a ratio
+    #  `var = ( a * var + b) / ( c * var + 1)`, so every
+    #  variance, and so every gain, comes from one
+    #  `_ratioScan()`.  The estimate is then a linear scan,
+    #  like the moving average.
+    def kalman( self, x, flux):
+        if not x.shape[ 1]:
+            return x.copy()
+        noise = self.r * self.fluxRef / numpy.maximum( flux, 1)
+        q = self.q
+        seen, start, before = self._starts( x, self.estimate)
+        #  A measurement: var = ( var + q) * noise / ( var + q + noise)
+        #  Rejected: var = var + q.  First: var = noise.
+        total = q + noise
+        a = numpy.where( seen, noise / total, 1.0)
+        b = numpy.where( seen, q * a, q)
+        c = numpy.where( seen, 1 / total, 0.0)
+        if start is not None:
+            a[ start], b[ start], c[ start] = 0.0, noise[ start], 0.0
+        var = _ratioScan( a, b, c, self.variance)
+        prior = numpy.empty_like( var)
+        prior[ :, 0] = self.variance
+        prior[ :, 1:] = var[ :, :-1]
+        prior += q
+        gain = numpy.where( seen, prior / ( prior + noise), 0.0)
+        if start is not None:
+            gain[ start] = 1.0
+        out = _linearScan( 1 - gain, numpy.where( seen, gain * x, 0.0),
+                           numpy.nan_to_num( self.estimate))
+        if before is not None:
+            out[ before] = numpy.nan
+        self.estimate, self.variance = out[ :, -1], var[ :, -1]
+        return out
+
+#  - - - -  Recursions along the samples  - - - -
+#  Run `y = c * y + b` along each row, from `y0`, and
+#  return every `y`.  Steps are joined in pairs, then in
+#  fours and so on (a prefix scan), so a batch of n
+#  samples takes log2( n) whole array operations instead
+#  of a Python loop over the samples.
+def _linearScan( c, b, y0):
+    c = c.copy()
+    b = b.copy()
+    step = 1
+    while step < c.shape[ 1]:
+        b[ :, step:] = c[ :, step:] * b[ :, :-step] + b[ :, step:]
+        c[ :, step:] = c[ :, step:] * c[ :, :-step]
+        step *= 2
+    return c * y0[ :, None] + b
+
+#  The same for `y = ( a * y + b) / ( c * y + 1)`, with
+#  a, b and c not negative.  Each step is the 2x2 matrix
+#  [[ a, b], [ c, 1]]; two steps join as a matrix product,
+#  scaled to bring its last element back to 1.
+def _ratioScan( a, b, c, y0):
+    a, b, c = a.copy(), b.copy(), c.copy()
+    step = 1
+    while step < a.shape[ 1]:
+        an, bn, cn = a[ :, step:], b[ :, step:], c[ :, step:]
+        ap, bp, cp = a[ :, :-step], b[ :, :-step], c[ :, :-step]
+        scale = 1 / ( cn * bp + 1)
+        a[ :, step:], b[ :, step:], c[ :, step:] =\
+            ( an * ap + bn * cp) * scale,\
+            ( an * bp + bn) * scale,\
+            ( cn * ap + cp) * scale
+        step *= 2
+    y0 = y0[ :, None]
+    return ( a * y0 + b) / ( c * y0 + 1)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#            ZONE AND RATE OF CHANGE EVENTS
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  A `Detector` watches every frame as it is decoded, in
+#  the thread that reads the bus, and reports only when
+#  a condition starts or stops, instead of every consumer
+#  testing every frame itself:
+#      detector = tfl.Detector()
+#      detector.zone( 'near', 0, 50, hysteresis = 5, debounce = 2)
+#      detector.rate( 'closing', -100)    # cm/s, approaching
+#      detector.subscribe( print)
+#      detector.attach( group)
+#
+#  A zone is active while the distance is in [ low, high),
+#  and stays active until it leaves that range widened by
+#  `hysteresis` cm.  A rate is active while the smoothed
+#  rate of change of distance is at or beyond `limit` cm/s
+#  (a negative limit means approaching), and stays active
+#  until it falls back by `hysteresis` cm/s.  A change only
+#  counts after `debounce` frames in a row agree with it.
+#  Each rule applies to one device address, or to all of
+#  them if `addr` is None, and keeps its state for each
+#  device.  Frames that are not `TFL_READY` are ignored.
+#
+#  Each change is an `Event`.  Callbacks run in the reading
+#  thread, within the frame that caused the change, so they
+#  should be quick.  Events are also put on `events`, a
+#  queue that a consumer can block on; when it is full, the
+#  oldest event is dropped and counted in `dropped`.
+Event = namedtuple( 'Event', 'name port addr active dist time')
+
+class _Zone:
+    def __init__( self, name, low, high, addr, hysteresis, debounce):
+        self.name, self.addr, self.debounce = name, addr, debounce
+        self.low, self.high, self.hysteresis = low, high, hysteresis
+        self.states = {}
+
+    def test( self, state, dist, now):
+        if state.active:
+            return self.low - self.hysteresis <= dist < \
+                   self.high + self.hysteresis
+        return self.low <= dist < self.high
+
+class _Rate:
+    def __init__( self, name, limit, addr, hysteresis, debounce, alpha):
+        self.name, self.addr, self.debounce = name, addr, debounce
+        self.sign = -1 if limit < 0 else 1
+        self.limit, self.hysteresis = abs( limit), hysteresis
+        self.alpha = alpha          # weight of each new rate
+        self.states = {}
+
+    def test( self, state, dist, now):
+        last, state.dist = state.dist, dist
+        then, state.time = state.time, now
+        if last is None or now <= then:
+            return state.active
+        rate = ( dist - last) / ( now - then)
+        if state.rate is not None:
+            rate = state.rate + self.alpha * ( rate - state.rate)
+        state.rate = rate
+        if state.active:
+            return rate * self.sign >= self.limit - self.hysteresis
+        return rate * self.sign >= self.limit
+
+class _RuleState:
+    __slots__ = ( 'active', 'count', 'dist', 'time', 'rate')
+
+    def __init__( self):
+        self.active = False
+        self.count = 0          # frames in a row that disagree
+        self.dist = None        # last distance and time, for rates
+        self.time = None
+        self.rate = None        # smoothed rate of change, cm/s
+
+class Detector:
+    ''' Zone and rate of change events from every frame '''
+
+    def __init__( self, maxsize = 1024):
+        self.rules = []
+        self.callbacks = []
+        self.events = queue.Queue( maxsize)
+        self.dropped = 0
+
+    def zone( self, name, low, high, addr = None, hysteresis = 0,
+              debounce = 1):
+        ''' Watch for the distance entering or leaving a range '''
+        self.rules.append( _Zone( name, low, high, addr, hysteresis, debounce))
+
+    def rate( self, name, limit, addr = None, hysteresis = 0, debounce = 1,
+              alpha = 0.3):
+        ''' Watch for the distance changing faster than `limit` '''
+        self.rules.append( _Rate( name, limit, addr, hysteresis, debounce,
+                                  alpha))
+
+    def subscribe( self, callback):
+        ''' Call `callback( event)` for every event '''
+        self.callbacks.append( callback)
+
+    def unsubscribe( self, callback):
+        self.callbacks.remove( callback)
+
+    #  Watch every frame that these devices decode
+    def attach( self, sensors):
+        ''' Attach to a device, or to every device of a group '''
+        for sensor in ( [ sensors] if isinstance( sensors, TFLuna)
+                        else sensors):
+            sensor.detector = self
+
+    #  Test the last frame of `sensor` against every rule.
+    #  Called by `TFLuna.decode()` for attached devices.
+    def feed( self, sensor):
+        if sensor.status != TFL_READY:
+            return
+        key = ( sensor.port, sensor.addr)
+        dist = sensor.dist
+        now = sensor.time if sensor.time is not None else time.monotonic()
+        for rule in self.rules:
+            if rule.addr is not None and rule.addr != sensor.addr:
+                continue
+            state = rule.states.get( key)
+            if state is None:
+                state = rule.states[ key] = _RuleState()
+            active = rule.test( state, dist, now)
+            if active == state.active:
+                state.count = 0
+                continue
+            state.count += 1
+            if state.count >= rule.debounce:
+                state.active = active
+                state.count = 0
+                self._emit( Event( rule.name, sensor.port, sensor.addr,
+                                   active, dist, now))
+
+    def _emit( self, event):
+        for callback in self.callbacks:
+            callback( event)
+        while True:
+            try:
+                self.events.put_nowait( event)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    #  Wait for the next event, or None after `timeout` s
+    def get( self, timeout = None):
+        ''' Return the next event from the queue '''
+        try:
+            return self.events.get( timeout = timeout)
+        except queue.Empty:
+            return None
+
+    #  Whether a rule is active now for a device
+    def active( self, name, addr, port = None):
+        for rule in self.rules:
+            if rule.name == name:
+                for ( p, a), state in rule.states.items():
+                    if a == addr and ( port is None or p == port):
+                        return state.active
+        return False
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#              HOT PATH INSTRUMENTATION
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  `instrument()` turns on counting of every bus
+#  operation.  For each operation and device address it
+#  keeps the number of transactions, bytes moved, errors,
+#  total time and a latency histogram.  It also counts the
+#  status of every frame (`TFL_WEAK`, `TFL_FLOOD`, I2C
+#  errors...) and the time spent sleeping between trigger
+#  and read.  Only buses opened after `instrument()` is
+#  called are counted.  When it is off, buses are not
+#  wrapped at all and the only cost is one `None` test
+#  for each frame.
+#
+#  Histogram bucket `i` counts operations that took less
+#  than 2**i microseconds (and at least 2**(i-1)).
+TFL_HIST_BUCKETS = 24
+
+class _OpStats:
+    __slots__ = ( 'count', 'bytes', 'errors', 'time', 'hist')
+
+    def __init__( self):
+        self.count = 0
+        self.bytes = 0
+        self.errors = 0
+        self.time = 0.0
+        self.hist = [ 0] * TFL_HIST_BUCKETS
+
+    def export( self):
+        return { 'count': self.count, 'bytes': self.bytes,
+                 'errors': self.errors, 'time': self.time,
+                 'mean': self.time / self.count if self.count else 0.0,
+                 'p50': _histPercentile( self.hist, 0.50),
+                 'p99': _histPercentile( self.hist, 0.99),
+                 'hist': list( self.hist)}
+
+#  Upper bound, in seconds, of the bucket that holds the
+#  `q` quantile of a latency histogram
+def _histPercentile( hist, q):
+    total = sum( hist)
+    if not total:
+        return 0.0
+    seen = 0
+    for i, count in enumerate( hist):
+        seen += count
+        if seen >= q * total:
+            return ( 1 << i) / 1e6
+    return ( 1 << ( len( hist) - 1)) / 1e6
+
+class Stats:
+    ''' Bus operation and status counters '''
+
+    def __init__( self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset( self):
+        with self.lock:
+            self.ops = {}          # ( op, addr) -> _OpStats
+            self.statuses = {}     # ( addr, status) -> count
+            self.started = time.time()
+
+    def addOp( self, op, addr, seconds, size, failed = False):
+        bucket = min( int( seconds * 1e6).bit_length(), TFL_HIST_BUCKETS - 1)
+        with self.lock:
+            entry = self.ops.get( ( op, addr))
+            if entry is None:
+                entry = self.ops[ ( op, addr)] = _OpStats()
+            entry.count += 1
+            entry.bytes += size
+            entry.time += seconds
+            entry.hist[ bucket] += 1
+            if failed:
+                entry.errors += 1
+
+    def addStatus( self, addr, code):
+        with self.lock:
+            key = ( addr, code)
+            self.statuses[ key] = self.statuses.get( key, 0) + 1
+
+    #  - - - -  Export as plain dictionaries  - - - -
+    #  The result can be written straight out as JSON.
+    def export( self):
+        ''' Return a copy of all counters '''
+        with self.lock:
+            ops = [ dict( op = op, addr = addr, **entry.export())
+                    for ( op, addr), entry in sorted( self.ops.items(),
+                        key = lambda item: ( item[ 0][ 0], item[ 0][ 1] or 0))]
+            statuses = [ { 'addr': addr, 'status': code,
+                           'name': TFL_STATUS_TEXT.get( code, "OTHER"),
+                           'count': count}
+                         for ( addr, code), count in sorted( self.statuses.items())]
+            return { 'since': self.started, 'ops': ops, 'statuses': statuses}
+
+    #  Sum of transactions and bytes over all bus operations
+    def totals( self):
+        with self.lock:
+            entries = [ entry for ( op, addr), entry in self.ops.items()
+                        if op != 'sleep']
+            return ( sum( e.count for e in entries),
+                     sum( e.bytes for e in entries))
+
+#  A bus wrapper that times every operation into `stats`
+class InstrumentedBus:
+    ''' Bus wrapper that counts every operation '''
+
+    def __init__( self, bus, stats):
+        self.bus = bus
+        self.stats = stats
+
+    def _run( self, op, addr, size, func, *args):
+        start = time.perf_counter()
+        try:
+            result = func( *args)
+        except OSError:
+            self.stats.addOp( op, addr, time.perf_counter() - start, 0, True)
+            raise
+        self.stats.addOp( op, addr, time.perf_counter() - start, size)
+        return result
+
+    def write_quick( self, addr):
+        return self._run( 'write_quick', addr, 0, self.bus.write_quick, addr)
+
+    def read_byte_data( self, addr, reg):
+        return self._run( 'read_byte_data', addr, 1,
+                          self.bus.read_byte_data, addr, reg)
+
+    def write_byte_data( self, addr, reg, value):
+        op = 'trigger' if reg == TFL_TRIGGER else 'write_byte_data'
+        return self._run( op, addr, 1,
+                          self.bus.write_byte_data, addr, reg, value)
+
+    def read_word_data( self, addr, reg):
+        return self._run( 'read_word_data', addr, 2,
+                          self.bus.read_word_data, addr, reg)
+
+    def write_word_data( self, addr, reg, value):
+        return self._run( 'write_word_data', addr, 2,
+                          self.bus.write_word_data, addr, reg, value)
+
+    def read_i2c_block_data( self, addr, reg, length = 32):
+        return self._run( 'read_i2c_block_data', addr, length,
+                          self.bus.read_i2c_block_data, addr, reg, length)
+
+    #  Batch operations are counted once for the whole batch
+    def writeMany( self, items):
+        return self._run( 'writeMany', None, len( items),
+                          self.bus.writeMany, items)
+
+    def readMany( self, items):
+        return self._run( 'readMany', None, sum( item[ 2] for item in items),
+                          self.bus.readMany, items)
+
+    def close( self):
+        self.bus.close()
+
+    #  Pass any other backend methods straight through
+    def __getattr__( self, name):
+        return getattr( self.bus, name)
+
+#  Whether a bus has batch operations.  `InstrumentedBus`
+#  and `RetryBus` always seem to, so look at the bus they wrap.
+def _hasBatch( bus):
+    while isinstance( bus, ( InstrumentedBus, RetryBus)):
+        bus = bus.bus
+    return hasattr( bus, 'readMany') and hasattr( bus, 'writeMany')
+
+#  - - - -  Turn instrumentation on or off  - - - -
+def instrument( enable = True):
+    ''' Start or stop counting bus operations '''
+    global stats
+    if enable:
+        if stats is None:
+            stats = Stats()
+    else:
+        stats = None
+    return stats
+
+def getStats():
+    ''' Return the counters as a dictionary, or None '''
+    return stats.export() if stats is not None else None
+
+def resetStats():
+    if stats is not None:
+        stats.reset()
+
+#  - - - -  Wait for several devices at once  - - - -
+#  Poll every device that has not answered yet until all
+#  answer or `timeout` seconds pass.  Return a list of
+#  booleans, in device order.
+def waitAllReady( sensors, timeout = 3.0, interval = 0.002):
+    ''' Poll several devices until they answer '''
+    ready = [ False] * len( sensors)
+    deadline = time.monotonic() + timeout
+    while True:
+        for i, sensor in enumerate( sensors):
+            if not ready[ i]:
+                ready[ i] = sensor._poll()
+        remain = deadline - time.monotonic()
+        if all( ready) or remain <= 0:
+            return ready
+        time.sleep( min( interval, remain))
+        interval = min( interval * 2, 0.05)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#            RETRY WITH JITTERED BACKOFF
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  Call `func( *args)` and, if it raises `OSError`, call
+#  it again up to `retries` more times.  Before each retry
+#  wait a random time up to `base * 2**n` seconds, capped
+#  at `cap`, so that a single NACK costs a millisecond or
+#  two instead of seconds.
+def retry( func, *args, retries = 3, base = 0.001, cap = 0.05):
+    ''' Retry a bus transaction with jittered backoff '''
+    for attempt in range( retries):
+        try:
+            return func( *args)
+        except OSError:
+            time.sleep( random.uniform( 0, min( cap, base * 2 ** attempt)))
+    return func( *args)
+
+#  A bus wrapper that retries every failed transaction.
+#  `TFLuna( retries = n)` and `SensorGroup( retries = n)`
+#  wrap the buses they open with it.
+class RetryBus:
+    ''' Bus wrapper that retries failed transactions '''
+
+    def __init__( self, bus, retries = 3, base = 0.001, cap = 0.05):
+        self.bus = bus
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+
+    def __getattr__( self, name):
+        func = getattr( self.bus, name)
+        if name == 'close' or not callable( func):
+            return func
+        def retried( *args):
+            return retry( func, *args, retries = self.retries,
+                          base = self.base, cap = self.cap)
+        return retried
+
+#  Sleep, and count the time slept if instrumented
+def _sleep( seconds):
+    if stats is None:
+        time.sleep( seconds)
+        return
+    start = time.perf_counter()
+    time.sleep( seconds)
+    stats.addOp( 'sleep', None, time.perf_counter() - start, 0)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#                 TF-LUNA DEVICE OBJECT
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  A `TFLuna` holds one I2C bus handle for its whole
+#  lifetime instead of opening and closing the bus for
+#  every register access.  A bus handle may be passed
+#  in to share one bus among several devices; a shared
+#  handle is not closed by the device.
+class TFLuna:
+    ''' Benewake TF-Luna device in I2C mode '''
+
+    def __init__( self, addr = 0x10, port = 4, bus = None, retries = 0):
+        self.addr = addr      # device address, 0x08 to 0x77
+        self.port = port      # host I2C port number
+        self.bus = bus        # open bus handle or None
+        self.ownBus = False   # True if `open()` created the handle
+        self.retries = retries  # extra attempts for a failed transaction
+        self.status = TFL_READY
+        self.dist = 0
+        self.flux = 0
+        self.temp = 0
+        self.tick = None      # device clock of the last frame, if read
+        self.time = None      # host capture time of the last frame
+        self.clock = TickClock()  # maps `tick` to host time
+        self.triggered = None # host time of the last trigger
+        self.resetTick = None # tick before a reset, until it reboots
+        self.rebooted = False # a poll failed since the reset
+        self.config = None    # cached `Snapshot`, None until read
+        self.tempRaw = 0      # temperature in hundredths of a degree
+        self.buffer = None    # `SampleBuffer` that collects every frame
+        self.detector = None  # `Detector` that watches every frame
+        self.lastTick = None  # tick of the last new frame
+
+    def __repr__( self):
+        return f"TFLuna(addr=0x{self.addr:02X}, port={self.port})"
+
+    #  - - - -  Open and close the I2C bus  - - - -
+    def open( self):
+        ''' Open the I2C bus if it is not already open '''
+        if self.bus is None:
+            self.bus = openBus( self.port)
+            if self.retries:
+                self.bus = RetryBus( self.bus, self.retries)
+            self.ownBus = True
+        return self
+
+    def close( self):
+        ''' Close the I2C bus if this device opened it '''
+        if self.bus is not None and self.ownBus:
+            self.bus.close()
+        self.bus = None
+        self.ownBus = False
+
+    def __enter__( self):
+        return self.open()
+
+    def __exit__( self, *exc):
+        self.close()
+
+    def _bus( self):
+        if self.bus is None:
+            self.open()
+        return self.bus
+
+    #  - - - -  Test communication, set trigger mode  - - - -
+    def begin( self):
+        ''' Test the device address and set trigger mode '''
+        try:
+            bus = self._bus()
+            bus.write_quick( self.addr)   #  Short test transaction
+            # Set device to single-shot/trigger mode
+            self.setModeTrig()
+            return True
+        except Exception:
+            if self.ownBus:
+                self.close()
+            return False
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #             GET DATA FROM THE DEVICE
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #  Return `True`/`False` whether data received without
+    #  error and set device status
+    def getData( self):
+        ''' Get get three data values '''
+        # Trigger a one-shot data sample.  The read may not
+        # wait long enough for it, so it does not bound the
+        # capture time.
+        self.triggered = None
+        self._bus().write_byte_data( self.addr, TFL_TRIGGER, 1)
+        return self.readData()
+
+    #  Read the result of the last measurement without
+    #  triggering a new one.  The device tick is read in
+    #  the same block to time the measurement; a `size` of
+    #  6 leaves it out.
+    def readData( self, size = 8):
+        ''' Read three data values '''
+        #  Read the first eight (or six) registers
+        host = time.monotonic()
+        return self.decode( self._bus().read_i2c_block_data( self.addr, 0, size),
+                            host)
+
+    #  - - - -  Raw frames, not decoded  - - - -
+    #  Return the data registers exactly as read, as bytes.
+    #  `getRaw()` triggers a new measurement first, like
+    #  `getData()`; `readRaw()` does not.  Decode them in
+    #  bulk later with `RawFrames`.
+    def getRaw( self, size = 6):
+        ''' Trigger and read the raw data registers '''
+        self._bus().write_byte_data( self.addr, TFL_TRIGGER, 1)
+        return self.readRaw( size)
+
+    def readRaw( self, size = 6):
+        ''' Read the raw data registers '''
+        return bytes( self._bus().read_i2c_block_data( self.addr, 0, size))
+
+    #  Set the data values from a block of eight (or six)
+    #  registers that has already been read from the device.
+    #  `host` is the `time.monotonic()` when the read began.
+    def decode( self, frame, host = None):
+        ''' Decode a block of data registers '''
+        #  Shift data from read array into the three variables
+        self.dist = frame[ 0] + ( frame[ 1] << 8)
+        self.flux = frame[ 2] + ( frame[ 3] << 8)
+        # Convert temp to degrees from hundredths
+        self.tempRaw = frame[ 4] + ( frame[ 5] << 8)
+        self.temp = self.tempRaw / 100
+        self.tick = None
+        self.time = None
+        if len( frame) >= 8:
+            self.tick = frame[ 6] + ( frame[ 7] << 8)
+            if host is not None:
+                self.time = self.clock.update( self.tick, host,
+                                               self.triggered)
+        self.triggered = None
+
+        #  Evaluate Abnormal Data Values
+        self.status = evalData( self.dist, self.flux)
+
+        #  A frame that repeats the tick of the last one is the
+        #  same measurement read again, as when `stream()` polls
+        #  before the next frame.  It is only counted, kept and
+        #  watched once.  Without a tick every frame is new.
+        if self.tick is not None and self.tick == self.lastTick:
+            return self.status == TFL_READY
+        self.lastTick = self.tick
+        if stats is not None:
+            stats.addStatus( self.addr, self.status)
+
+        #  Keep the sample if a buffer is attached
+        if self.buffer is not None:
+            self.buffer.append( _wallTime( self.time), self.tick or 0,
+                                self.dist, self.flux, self.tempRaw,
+                                self.status)
+        if self.detector is not None:
+            self.detector.feed( self)
+        return self.status == TFL_READY
+
+    #  Return the last data values as a `Frame`
+    def frame( self):
+        return Frame( self.addr, self.dist, self.flux, self.temp,
+                      self.status, self.tick, self.time)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #          STREAM FRAMES IN CONTINUOUS MODE
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #  Switch the device to continuous mode at `fps` and
+    #  yield a `Frame` for every new measurement.  Each poll
+    #  is one eight byte block read of distance, flux, temp
+    #  and tick; a frame is new when the tick has changed.
+    #  Polls are scheduled one frame apart and a little
+    #  early, and repeated quickly if the device has not
+    #  updated yet, so the stream stays locked to the device
+    #  with about one transaction per frame.  The mode and
+    #  frame rate the device had are put back when the
+    #  generator is closed.
+    def stream( self, fps = 100):
+        ''' Yield new frames in continuous mode '''
+        oldMode, oldFps = self.getMode(), self.getFrameRate()
+        self.setFrameRate( fps)
+        self.setModeCont()
+        period = 1 / fps
+        retry = period / 8       # re-poll interval if no new frame
+        lead = period / 256      # drift toward the device update
+        last = None
+        due = time.monotonic()
+        try:
+            while True:
+                delay = due - time.monotonic()
+                if delay > 0:
+                    _sleep( delay)
+                elif delay < -period:         # fell behind, so resync
+                    due = time.monotonic()
+                self.readData()
+                if self.tick == last:
+                    due += retry
+                    continue
+                last = self.tick
+                due += period - lead
+                yield self.frame()
+        finally:
+            try:
+                self.setFrameRate( oldFps)
+                if oldMode == 'trigger':
+                    self.setModeTrig()
+            except OSError:
+                pass
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #              EXPLICIT COMMANDS
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #  Every command that writes a setting or resets the
+    #  device drops the cached configuration (see `snapshot()`).
+    #  The device does not answer for a while after a save
+    #  or a reset; with `wait = True` these commands return
+    #  only when it answers again (see `waitReady()`).
+    def saveSettings( self, wait = False):
+        self._bus().write_byte_data( self.addr, TFL_SAVE_SETTINGS, 1)
+        return self.waitReady() if wait else True
+
+    def softReset( self, wait = False):
+        self.config = None
+        self.clock.reset()
+        self._markReset()
+        self._bus().write_byte_data( self.addr, TFL_SOFT_RESET, 2)
+        return self.waitReady() if wait else True
+
+    def hardReset( self, wait = False):
+        self.config = None
+        self.clock.reset()
+        self._markReset()
+        self._bus().write_byte_data( self.addr, TFL_HARD_RESET, 1)
+        return self.waitReady() if wait else True
+
+    #  The device can still answer for a moment after a reset
+    #  command, before it reboots.  Keep the tick from before
+    #  the reset so that `waitReady()` can tell the two apart.
+    def _markReset( self):
+        try:
+            self.resetTick = self._bus().read_word_data( self.addr,
+                                                         TFL_TICK_LO)
+        except OSError:
+            self.resetTick = 0
+        self.rebooted = False
+
+    #  One readiness poll.  After a reset, the device is only
+    #  ready once it has rebooted: a poll has failed, or its
+    #  tick has gone back below the tick before the reset.
+    def _poll( self):
+        try:
+            tick = self._bus().read_word_data( self.addr, TFL_TICK_LO)
+        except OSError:
+            self.rebooted = True
+            return False
+        if self.resetTick is None or self.rebooted or tick < self.resetTick:
+            self.resetTick = None
+            return True
+        return False
+
+    #  - - - -  Wait for the device to answer  - - - -
+    #  Poll the device until a register read succeeds, with
+    #  the poll interval doubling from `interval` up to 50ms.
+    #  After a reset, wait for the reboot as well (see
+    #  `_poll()`).  Return `False` if it has not answered in
+    #  `timeout` seconds.  This replaces a fixed sleep after
+    #  a reset.
+    def waitReady( self, timeout = 3.0, interval = 0.002):
+        ''' Poll until the device answers '''
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._poll():
+                return True
+            remain = deadline - time.monotonic()
+            if remain <= 0:
+                return False
+            time.sleep( min( interval, remain))
+            interval = min( interval * 2, 0.05)
+
+    #  Range: 0x08, 0x77.  Must be followed by
+    #  `saveSettings()` and 'softReset()` commands
+    def setI2Caddr( self, addrNew):
+        self.config = None
+        self._bus().write_byte_data( self.addr, TFL_SET_I2C_ADDR, addrNew)
+
+    def getI2Caddr( self):
+        return self._config().addr
+
+    def setEnable( self):
+        self.config = None
+        self._bus().write_byte_data( self.addr, TFL_DISABLE, 0)
+
+    def setDisable( self):
+        self.config = None
+        self._bus().write_byte_data( self.addr, TFL_DISABLE, 1)
+
+    def setModeCont( self):
+        self.config = None
+        self._bus().write_byte_data( self.addr, TFL_SET_MODE, 0)
+
+    def setModeTrig( self):
+        self.config = None
+        self._bus().write_byte_data( self.addr, TFL_SET_MODE, 1)
+
+    def getMode( self):
+        return self._config().mode
+
+    def setTrigger( self):
+        self.triggered = time.monotonic()
+        self._bus().write_byte_data( self.addr, TFL_TRIGGER, 1)
+
+    def setFrameRate( self, fps):
+        self.config = None
+        self._bus().write_word_data( self.addr, TFL_FPS_LO, ( fps))
+
+    def getFrameRate( self):
+        return self._config().fps
+
+    #  Low power mode, 0-normal, 1-low power
+    def setLowPower( self, on = True):
+        self.config = None
+        self._bus().write_byte_data( self.addr, TFL_SET_LO_PWR, 1 if on else 0)
+
+    def getTime( self):
+        return self._bus().read_word_data( self.addr, TFL_TICK_LO)
+
+    def getProdCode( self):
+        return self._config().prodCode
+
+    def getFirmwareVersion( self):
+        return self._config().version
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #           REGISTER SNAPSHOT AND CONFIG CACHE
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #  Read the whole register map, 0x00 to 0x29, in two
+    #  block reads and return it decoded as a `Snapshot`.
+    #  The snapshot is also kept as the cached configuration
+    #  that answers `getMode()`, `getFrameRate()`,
+    #  `getI2Caddr()`, `getFirmwareVersion()` and
+    #  `getProdCode()` without bus traffic.  The cache is
+    #  dropped by any write or reset made through this object.
+    def snapshot( self):
+        ''' Read and decode all device registers '''
+        bus = self._bus()
+        regs = bus.read_i2c_block_data( self.addr, 0x00, 32) +\
+               bus.read_i2c_block_data( self.addr, 0x20, TFL_REG_COUNT - 32)
+        self.config = decodeRegisters( regs)
+        return self.config
+
+    def _config( self):
+        if self.config is None:
+            self.snapshot()
+        return self.config
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #            APPLY A CONFIGURATION IN ONE GO
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #  `config` is a dictionary of the wanted settings, by
+    #  `Snapshot` field name:
+    #      addr      0x08 to 0x77
+    #      mode      'continuous' or 'trigger'
+    #      enable    True or False
+    #      fps       frames per second
+    #      lowPower  True or False
+    #  `apply()` reads the current settings, writes only the
+    #  ones that differ, then saves and resets at most once
+    #  and reads the settings back to verify them.  If
+    #  nothing differs, nothing is written, so the flash is
+    #  not worn by saves that change nothing.  Returns an
+    #  `Applied` record of the changes and whether the device
+    #  came back with all of the wanted settings.
+    def diff( self, config):
+        ''' Return the settings that differ from `config` '''
+        for key in config:
+            if key not in TFL_SETTINGS:
+                raise ValueError( "not a device setting: " + str( key))
+        snap = self.snapshot()
+        return { key: value for key, value in config.items()
+                 if getattr( snap, key) != value}
+
+    def _writeSettings( self, changes):
+        for key, value in changes.items():
+            if key == 'addr':
+                self.setI2Caddr( value)
+            elif key == 'mode':
+                if value == 'continuous': self.setModeCont()
+                else:                     self.setModeTrig()
+            elif key == 'enable':
+                if value: self.setEnable()
+                else:     self.setDisable()
+            elif key == 'fps':
+                self.setFrameRate( value)
+            elif key == 'lowPower':
+                self.setLowPower( value)
+
+    #  Check the settings after a reset
+    def _verify( self, config):
+        try:
+            snap = self.snapshot()
+        except OSError:
+            return False
+        return all( getattr( snap, key) == value
+                    for key, value in config.items())
+
+    def apply( self, config, reset = True, timeout = 3.0):
+        ''' Write, save and verify only the changed settings '''
+        changes = self.diff( config)
+        if not changes:
+            return Applied( self.addr, changes, True)
+        self._writeSettings( changes)
+        self.saveSettings()
+        ready = self.waitReady( timeout)
+        if ready and reset:
+            self.softReset()
+            self.addr = changes.get( 'addr', self.addr)
+            ready = self.waitReady( timeout)
+        return Applied( self.addr, changes, ready and self._verify( config))
+
+    def printStatus( self):
+        ''' Print status condition'''
+        print( "Status: " + TFL_STATUS_TEXT.get( self.status, "OTHER"))
+#
+# - - - - - -   End of TFLuna class  - - - - - - - -
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#              GROUP OF DEVICES ON ONE BUS
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  A `SensorGroup` holds many device addresses on one
+#  shared bus handle.  `getData()` triggers every device
+#  back to back, waits one measurement period and then
+#  reads every device back, so a round of N devices takes
+#  about one frame time instead of N frame times.
+class SensorGroup:
+    ''' Several TF-Luna devices sharing one I2C bus '''
+
+    def __init__( self, addrs, port = 4, bus = None, period = TFL_FRAME_TIME,
+                  retries = 0, quarantine = 3, rejoinTime = 0.1):
+        self.port = port
+        self.bus = bus
+        self.ownBus = False
+        self.period = period      # seconds from trigger to read
+        self.retries = retries    # extra attempts for a failed transaction
+        self.quarantine = quarantine  # failed rounds before leaving rounds
+        self.rejoinTime = rejoinTime  # first wait before trying again
+        self.failures = {}        # addr -> consecutive failed rounds
+        self.retryAt = {}         # addr -> time to try a benched device
+        self.sensors = [ TFLuna( addr, port, bus) for addr in addrs]
+
+    def __repr__( self):
+        addrs = ', '.join( f"0x{s.addr:02X}" for s in self.sensors)
+        return f"SensorGroup([{addrs}], port={self.port})"
+
+    def __len__( self):
+        return len( self.sensors)
+
+    def __iter__( self):
+        return iter( self.sensors)
+
+    #  - - - -  Open and close the shared bus  - - - -
+    def open( self):
+        if self.bus is None:
+            self.bus = openBus( self.port)
+            if self.retries:
+                self.bus = RetryBus( self.bus, self.retries)
+            self.ownBus = True
+        for sensor in self.sensors:
+            sensor.bus = self.bus
+        return self
+
+    def close( self):
+        if self.bus is not None and self.ownBus:
+            self.bus.close()
+        self.bus = None
+        self.ownBus = False
+        for sensor in self.sensors:
+            sensor.bus = None
+
+    def __enter__( self):
+        return self.open()
+
+    def __exit__( self, *exc):
+        self.close()
+
+    #  Test every device and set it to trigger mode.
+    #  Return `True` only if all devices are ready.
+    def begin( self):
+        self.open()
+        ready = [ sensor.begin() for sensor in self.sensors]
+        return all( ready)
+
+    #  - - - -  Trigger all, wait, then read all  - - - -
+    #  Return a list of `Frame`, one for each device in
+    #  the order the addresses were given.  A device that
+    #  does not answer gets an I2C error status instead of
+    #  stopping the whole round.  After `quarantine` failed
+    #  rounds in a row, a device is left out of the rounds
+    #  and its frame has the `TFL_FAIL` status.  It is tried
+    #  again after `rejoinTime` seconds, doubling up to 5s
+    #  while it keeps failing, and rejoins when it answers.
+    #
+    #  If the bus has batch operations (`RdwrBus`), all of
+    #  the triggers go out in one batch and all of the reads
+    #  come back in another.  If a batch fails, that step is
+    #  done one device at a time to find the failed device.
+    def getData( self):
+        ''' Get one frame from every device '''
+        for sensor, block, host in self._round( 8):
+            sensor.decode( block, host)
+        return [ sensor.frame() for sensor in self.sensors]
+
+    #  - - - -  Raw frames from every device  - - - -
+    #  Like `getData()` but returns a `RawRound`: the raw
+    #  data registers of every device joined into one bytes
+    #  object in device order, ready for `RawFrames`, and the
+    #  status of each read.  A device that fails or is benched
+    #  gives a frame of zeros, and its status tells it apart
+    #  from data.  Device data values are not changed.
+    def getRaw( self, size = 6):
+        ''' Get the raw frames of every device '''
+        blocks = {}
+        for sensor, block, host in self._round( size):
+            blocks[ id( sensor)] = bytes( block)
+        zeros = bytes( size)
+        for sensor in self.sensors:
+            sensor.triggered = None      # these frames are not timed
+        return RawRound(
+            b''.join( blocks.get( id( sensor), zeros)
+                      for sensor in self.sensors),
+            [ TFL_READY if id( sensor) in blocks else sensor.status
+              for sensor in self.sensors])
+
+    #  One round: trigger every device that is not benched,
+    #  wait, and read `size` data registers from each.  Return
+    #  ( sensor, block, host) for each device that was read,
+    #  where `host` is the time just before its read.  Failed
+    #  and benched devices get their status here.
+    def _round( self, size):
+        self.open()
+        start = time.monotonic()
+        active = []
+        for sensor in self.sensors:
+            if start < self.retryAt.get( sensor.addr, 0):
+                sensor.status = TFL_FAIL          # benched for now
+            else:
+                active.append( sensor)
+        batch = _hasBatch( self.bus)
+
+        try:
+            if not batch:
+                raise OSError
+            self.bus.writeMany( [ ( sensor.addr, TFL_TRIGGER, 1)
+                                  for sensor in active])
+            for sensor in active:
+                sensor.triggered = start
+        except OSError:
+            triggered = []
+            for sensor in active:
+                try:
+                    sensor.setTrigger()
+                    triggered.append( sensor)
+                except OSError:
+                    self._failed( sensor, TFL_I2CWRITE, start)
+            active = triggered
+
+        #  Wait out the rest of one measurement period
+        delay = start + self.period - time.monotonic()
+        if delay > 0 and active:
+            _sleep( delay)
+
+        reads = []
+        try:
+            if not batch or not active:
+                raise OSError
+            host = time.monotonic()
+            blocks = self.bus.readMany( [ ( sensor.addr, 0, size)
+                                          for sensor in active])
+            reads = [ ( sensor, block, host)
+                      for sensor, block in zip( active, blocks)]
+        except OSError:
+            for sensor in active:
+                try:
+                    host = time.monotonic()
+                    block = self.bus.read_i2c_block_data( sensor.addr, 0, size)
+                    reads.append( ( sensor, block, host))
+                except OSError:
+                    sensor.triggered = None
+                    self._failed( sensor, TFL_I2CREAD, start)
+        for sensor, block, host in reads:
+            self.failures.pop( sensor.addr, None)
+            self.retryAt.pop( sensor.addr, None)
+        return reads
+
+    #  Count a failed round, and bench the device after
+    #  `quarantine` of them in a row
+    def _failed( self, sensor, code, now):
+        sensor.status = code
+        if stats is not None:
+            stats.addStatus( sensor.addr, code)
+        count = self.failures.get( sensor.addr, 0) + 1
+        self.failures[ sensor.addr] = count
+        if count >= self.quarantine:
+            wait = self.rejoinTime * 2 ** min( count - self.quarantine, 16)
+            self.retryAt[ sensor.addr] = now + min( wait, 5.0)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #          APPLY A CONFIGURATION TO EVERY DEVICE
+    # - - - - - - - - - - - - - - - - - - - - - - - - - -
+    #  Like `TFLuna.apply()`, but every phase runs for all
+    #  devices together: write the changed settings of every
+    #  device, save them all, wait for all of them, reset
+    #  them all, wait again and verify.  So the whole group
+    #  takes one save and one reboot window instead of one
+    #  per device.  `config` is either one dictionary of
+    #  settings for every device (without 'addr'), or a
+    #  dictionary of such dictionaries by device address.
+    #  Returns a list of `Applied`, in device order.
+    def apply( self, config, reset = True, timeout = 3.0):
+        ''' Apply settings to all devices in one reboot window '''
+        self.open()
+        if all( isinstance( key, int) for key in config):
+            configs = [ config.get( sensor.addr, {}) for sensor in self.sensors]
+        elif 'addr' in config:
+            raise ValueError( "one address for every device in a group")
+        else:
+            configs = [ config] * len( self.sensors)
+
+        plans = [ ( sensor, conf, sensor.diff( conf))
+                  for sensor, conf in zip( self.sensors, configs)]
+        changed = [ plan for plan in plans if plan[ 2]]
+        for sensor, conf, changes in changed:
+            sensor._writeSettings( changes)
+            sensor.saveSettings()
+        ready = waitAllReady( [ plan[ 0] for plan in changed], timeout)
+        if reset:
+            for ( sensor, conf, changes), ok in zip( changed, ready):
+                if ok:
+                    sensor.softReset()
+                    sensor.addr = changes.get( 'addr', sensor.addr)
+            ready = waitAllReady( [ plan[ 0] for plan in changed], timeout)
+
+        results = { id( sensor): ok for ( sensor, conf, changes), ok
+                    in zip( changed, ready)}
+        return [ Applied( sensor.addr, changes,
+                          results.get( id( sensor), True) and
+                          ( not changes or sensor._verify( conf)))
+                 for sensor, conf, changes in plans]
+
+    #  Devices currently left out of the rounds
+    def benched( self):
+        now = time.monotonic()
+        return [ sensor for sensor in self.sensors
+                 if now < self.retryAt.get( sensor.addr, 0)]
+
+    #  Attach a new `SampleBuffer` of `capacity` samples to
+    #  every device and return them in device order.
+    def attachBuffers( self, capacity = 1024):
+        for sensor in self.sensors:
+            sensor.buffer = SampleBuffer( capacity)
+        return [ sensor.buffer for sensor in self.sensors]
+
+    #  Return a `Snapshot` of every device, in order
+    def snapshot( self):
+        self.open()
+        return [ sensor.snapshot() for sensor in self.sensors]
+#
+# - - - - - -   End of SensorGroup class  - - - - - - - -
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#          BUS SCAN AND ADDRESS PROVISIONING
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  `scan()` probes every address, 0x08 to 0x77, on every
+#  port at once, one thread for each port, and reads the
+#  firmware version and product code of each device that
+#  answers in one block read.  A device whose product
+#  code is not ASCII text is not a TF-Luna.  As with
+#  `i2cdetect`, addresses 0x30-0x37 and 0x50-0x5F are
+#  probed with a read instead of a quick write, which
+#  can upset some EEPROMs.
+TFL_SCAN_ADDRS = range( 0x08, 0x78)
+TFL_ID_COUNT   = TFL_PROD_CODE + 14 - TFL_VER_REV  # version to product code
+
+#  A device found by `scan()`.  `prodCode` and `version`
+#  are None if it is not a TF-Luna.
+Found = namedtuple( 'Found', 'port addr prodCode version')
+
+def busPorts():
+    ''' Return the port numbers of the /dev/i2c-* buses '''
+    try:
+        names = os.listdir( '/dev')
+    except OSError:
+        return []
+    return sorted( int( name[ 4:]) for name in names
+                   if name.startswith( 'i2c-') and name[ 4:].isdigit())
+
+def _probe( bus, addr):
+    try:
+        if 0x30 <= addr <= 0x37 or 0x50 <= addr <= 0x5F:
+            bus.read_byte_data( addr, 0)
+        else:
+            bus.write_quick( addr)
+        return True
+    except OSError:
+        return False
+
+def _identify( bus, port, addr):
+    try:
+        regs = bus.read_i2c_block_data( addr, TFL_VER_REV, TFL_ID_COUNT)
+    except OSError:
+        return Found( port, addr, None, None)
+    code = bytes( regs[ TFL_PROD_CODE - TFL_VER_REV :]).rstrip( b'\0')
+    if not code or not all( 32 <= c < 127 for c in code):
+        return Found( port, addr, None, None)
+    version = f"{regs[ 2]}.{regs[ 1]}.{regs[ 0]}"
+    return Found( port, addr, code.decode( 'ascii'), version)
+
+def scanBus( port, addrs = TFL_SCAN_ADDRS):
+    ''' Find the devices on one port '''
+    bus = openBus( port)
+    try:
+        return [ _identify( bus, port, addr) for addr in addrs
+                 if _probe( bus, addr)]
+    finally:
+        bus.close()
+
+#  Return a `Found` for every device on every port, by
+#  port and address.  `ports` defaults to every
+#  /dev/i2c-* bus.  A port that cannot be opened is skipped.
+def scan( ports = None, addrs = TFL_SCAN_ADDRS):
+    ''' Find the devices on every port at once '''
+    if ports is None:
+        ports = busPorts()
+    found = []
+    with ThreadPoolExecutor( max( len( ports), 1)) as pool:
+        for result in [ pool.submit( scanBus, port, addrs) for port in ports]:
+            try:
+                found.extend( result.result())
+            except OSError:
+                pass
+    return found
+
+#  - - - -  Give devices unique addresses  - - - -
+#  Devices that share an address cannot be told apart on
+#  the bus: they all take every write, and a read returns
+#  their answers ANDed together, which can look like one
+#  device.  So `scan()` cannot report a conflict, and the
+#  devices can only be re-addressed one at a time.
+#  `provision()` does this for `count` devices that start
+#  at address `default`: 0x10, the factory address, or
+#  any address that several devices were given by mistake.
+#  Before each one it calls `connect( n)`, which should
+#  connect or power up device n, for example with a GPIO
+#  pin, while the others sharing the address are still
+#  disconnected.  Without `connect`, whatever answers at
+#  `default` is moved as one device.  Each device gets
+#  the next address in `addrs` that is not in use on the
+#  bus, then is saved and reset.  The next device is
+#  connected while the last one resets, and is not touched
+#  until the last one answers at its new address.  Return
+#  an `Applied` for each device; it stops at the first
+#  device that does not come back at its new address.
+def provision( port, count = 1, connect = None,
+               addrs = range( 0x11, 0x78), default = 0x10, timeout = 3.0):
+    ''' Give devices that share an address unique addresses '''
+    if count > 1 and connect is None:
+        raise ValueError( "several devices need `connect` to be " +
+                          "re-addressed one at a time")
+    taken = { found.addr for found in scanBus( port)}
+    free = iter( [ addr for addr in addrs
+                   if addr not in taken and addr != default])
+    results = []
+    bus = openBus( port)
+    try:
+        if connect is not None:
+            connect( 0)
+        for n in range( count):
+            sensor = TFLuna( default, port, bus)
+            if not sensor.waitReady( timeout):
+                raise OSError( errno.ENODEV,
+                               f"no device at 0x{default:02X} on port {port}")
+            addr = next( free, None)
+            if addr is None:
+                raise ValueError( f"no free address left on port {port}")
+            sensor.setI2Caddr( addr)
+            sensor.saveSettings( wait = True)
+            sensor.softReset()
+            if connect is not None and n + 1 < count:
+                connect( n + 1)          # boots while this one resets
+            sensor = TFLuna( addr, port, bus)
+            ok = sensor.waitReady( timeout) and sensor.getI2Caddr() == addr
+            results.append( Applied( addr, { 'addr': addr}, ok))
+            if not ok:
+                break
+    finally:
+        bus.close()
+    return results
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#            PARALLEL ACQUISITION ON SEVERAL PORTS
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  A `MultiBus` runs one `SensorGroup` per I2C port, each
+#  on its own thread, so that separate buses are sampled
+#  in parallel and throughput grows with the number of
+#  buses.  All of the threads sample on one shared clock:
+#  round `n` starts at `epoch + n / rate` on every port.
+#  `rounds()` merges their output into a single stream of
+#  `Round` records, in time order, each holding the frames
+#  from every port for that sampling time:
+#      ports = { 0: [ 0x10, 0x11], 1: [ 0x10], 4: [ 0x12]}
+#      with tfl.MultiBus( ports, rate = 50) as multi:
+#          for rnd in multi.rounds():
+#              print( rnd.time, rnd.frames[ 4])
+#  A port that falls behind skips rounds to stay aligned,
+#  and is simply missing from those rounds.
+Round = namedtuple( 'Round', 'index time frames')
+
+class MultiBus:
+    ''' Time-aligned acquisition on several I2C ports '''
+
+    def __init__( self, ports, rate = 50, period = TFL_FRAME_TIME,
+                  maxsize = 64):
+        self.groups = [ SensorGroup( addrs, port, period = period)
+                        for port, addrs in ports.items()]
+        self.rate = rate
+        self.epoch = None          # monotonic time of round 0
+        self.queue = queue.Queue( maxsize)
+        self.stop = threading.Event()
+        self.threads = []
+
+    def __repr__( self):
+        return f"MultiBus({self.groups}, rate={self.rate})"
+
+    def __enter__( self):
+        return self.start()
+
+    def __exit__( self, *exc):
+        self.close()
+
+    #  - - - -  Start one worker thread per port  - - - -
+    def start( self):
+        for group in self.groups:
+            group.begin()
+        self.stop.clear()
+        self.epoch = time.monotonic() + 1 / self.rate
+        self.threads = [ threading.Thread( target = self._run, args = ( group,),
+                             name = f"tfli2c-multibus-{group.port}",
+                             daemon = True)
+                         for group in self.groups]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    #  Stop the workers, then queue an end marker so that
+    #  a consumer blocked in `rounds()` finishes too.
+    def close( self):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        for group in self.groups:
+            group.close()
+        while True:
+            try:
+                self.queue.put_nowait( ( None, None, None))
+                return
+            except queue.Full:      # make room by dropping the oldest
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    #  Queue an item, giving up if the engine is stopped
+    def _put( self, item):
+        while not self.stop.is_set():
+            try:
+                self.queue.put( item, timeout = 0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _run( self, group):
+        interval = 1 / self.rate
+        index = 0
+        try:
+            while not self.stop.is_set():
+                delay = self.epoch + index * interval - time.monotonic()
+                if delay > 0:
+                    if self.stop.wait( delay):
+                        break
+                elif delay < -interval:     # fell behind, so skip ahead
+                    index = int( -delay / interval) + index + 1
+                    continue
+                self._put( ( index, group.port, group.getData()))
+                index += 1
+        except Exception as error:
+            self._put( ( None, group.port, error))
+
+    #  - - - -  Merge the ports into one stream  - - - -
+    #  Round `n` is complete when every port has reported
+    #  round `n` or a later one.  An exception in a worker
+    #  is raised here, and the stream ends at `close()`.
+    def rounds( self):
+        ''' Yield time-aligned rounds from all ports '''
+        interval = 1 / self.rate
+        pending = {}
+        latest = { group.port: -1 for group in self.groups}
+        index = 0
+        while True:
+            got, port, frames = self.queue.get()
+            if got is None:
+                if frames is None:
+                    return
+                raise frames
+            pending.setdefault( got, {})[ port] = frames
+            latest[ port] = got
+            done = min( latest.values())
+            while index <= done:
+                frames = pending.pop( index, None)
+                if frames:
+                    yield Round( index, self.epoch + index * interval,
+                                 dict( sorted( frames.items())))
+                index += 1
+#
+# - - - - - -   End of MultiBus class  - - - - - - - -
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#          DEADLINE-DRIVEN TRIGGER SCHEDULER
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  A `TriggerScheduler` replaces fixed sleeps around a
+#  blocking `getData()`.  Rounds start on monotonic
+#  deadlines, `start + n / rate`, so the rate never
+#  drifts.  Every trigger and every read is an event in
+#  one time-ordered queue: each device is read exactly
+#  `delay` seconds after its own trigger completed, and
+#  while one device waits, the bus is used to trigger or
+#  read the others.  Reads come before triggers that are
+#  due at the same time, and each frame is yielded as
+#  soon as it is read:
+#      group = tfl.SensorGroup( [ 0x10, 0x11, 0x12], 4)
+#      for frame in tfl.TriggerScheduler( group, rate = 50).frames():
+#          ...
+#  Devices are put into trigger mode while the generator
+#  runs, and those that were in continuous mode are put
+#  back when it is closed.
+#  Each device is read `delay` seconds after its trigger,
+#  so `1 / rate` must be longer than `delay` plus the bus
+#  time of a read, or it is still waiting to be read when
+#  its next trigger is due and is triggered again straight
+#  after that read, a little late.  A `rate` of `1 / delay`
+#  or more can never be kept and raises `ValueError`.
+#  If the whole schedule falls more than one round behind,
+#  the missed rounds are skipped and counted in `missed`.
+_READ, _TRIGGER = 0, 1
+
+#  Put devices into trigger mode for a scheduler and
+#  return the ones that were in continuous mode, so that
+#  `_restoreModes()` can put them back afterwards
+def _triggerModes( sensors):
+    switched = []
+    for sensor in sensors:
+        try:
+            if sensor.getMode() != 'trigger':
+                sensor.setModeTrig()
+                switched.append( sensor)
+        except OSError:
+            pass
+    return switched
+
+def _restoreModes( switched):
+    for sensor in switched:
+        try:
+            sensor.setModeCont()
+        except OSError:
+            pass
+
+class TriggerScheduler:
+    ''' Pipelined trigger and read scheduler '''
+
+    def __init__( self, sensors, rate = 50, delay = TFL_FRAME_TIME):
+        if 1 / rate <= delay:
+            raise ValueError( f"rate {rate} is too fast for a delay " +
+                              f"of {delay} s from trigger to read")
+        if isinstance( sensors, SensorGroup):
+            sensors.open()
+        self.sensors = list( sensors)
+        self.rate = rate
+        self.delay = delay         # seconds from trigger to read
+        self.missed = 0            # rounds skipped to keep up
+
+    def __repr__( self):
+        return f"TriggerScheduler({self.sensors}, rate={self.rate})"
+
+    def frames( self):
+        ''' Yield frames from all devices as they are read '''
+        interval = 1 / self.rate
+        events = []                # ( time, kind, order, sensor)
+        waiting = set()            # devices triggered but not read
+        late = set()               # devices to trigger after their read
+        order = 0
+        due = time.monotonic()     # start of the next round
+        switched = _triggerModes( self.sensors)
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= due:
+                    behind = int( ( now - due) / interval)
+                    if behind:                     # skip the missed rounds
+                        self.missed += behind
+                        due += behind * interval
+                    for sensor in self.sensors:
+                        if id( sensor) in waiting:
+                            late.add( id( sensor))
+                        else:
+                            heapq.heappush( events,
+                                            ( due, _TRIGGER, order, sensor))
+                            order += 1
+                    due += interval
+
+                when = min( events[ 0][ 0], due) if events else due
+                if when > now:
+                    _sleep( when - now)
+                    continue
+                if when == due:
+                    continue
+
+                when, kind, _, sensor = heapq.heappop( events)
+                if kind == _TRIGGER:
+                    try:
+                        sensor.setTrigger()
+                    except OSError:
+                        sensor.status = TFL_I2CWRITE
+                        if stats is not None:
+                            stats.addStatus( sensor.addr, TFL_I2CWRITE)
+                        yield sensor.frame()
+                        continue
+                    waiting.add( id( sensor))
+                    heapq.heappush( events, ( time.monotonic() + self.delay,
+                                              _READ, order, sensor))
+                    order += 1
+                else:
+                    waiting.discard( id( sensor))
+                    try:
+                        sensor.readData()
+                    except OSError:
+                        sensor.status = TFL_I2CREAD
+                        if stats is not None:
+                            stats.addStatus( sensor.addr, TFL_I2CREAD)
+                    if id( sensor) in late:
+                        late.discard( id( sensor))
+                        heapq.heappush( events, ( time.monotonic(), _TRIGGER,
+                                                  order, sensor))
+                        order += 1
+                    yield sensor.frame()
+        finally:
+            _restoreModes( switched)
+#
+# - - - - - -   End of TriggerScheduler class  - - - - - - - -
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#           ADAPTIVE RATE AND LOW POWER CONTROL
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  An `AdaptiveScheduler` triggers each device at its own
+#  rate, chosen from `rates` (fastest first), and yields
+#  each frame as soon as it is read, like `TriggerScheduler`.
+#  A device whose distance stays within `threshold` cm of
+#  its last change for `hold` seconds steps down to the
+#  next slower rate; as soon as it moves by `threshold` cm
+#  or more, or its status changes, it goes straight back
+#  to the fastest rate.  The bus time and power then go to
+#  the devices that are seeing change:
+#      group = tfl.SensorGroup( [ 0x10, 0x11, 0x12], 4)
+#      for frame in tfl.AdaptiveScheduler( group).frames():
+#          ...
+#  The devices are put into trigger mode, so they only
+#  measure when they are triggered, and with `lowPower`
+#  a device is put into low power mode while its rate is
+#  at or below `TFL_LOW_POWER_FPS`.  These are plain register
+#  writes, without `saveSettings()` or a reset.  Low power
+#  mode is turned off again and the devices that were in
+#  continuous mode are put back when the generator is
+#  closed.  The slowest rate sets how long a still device
+#  takes to notice motion.
+TFL_LOW_POWER_FPS = 10     # highest frame rate in low power mode
+
+class _Pace:
+    __slots__ = ( 'level', 'ref', 'status', 'since', 'lowPower')
+
+    def __init__( self, now):
+        self.level = 0            # index into `rates`
+        self.ref = None           # distance at the last change
+        self.status = None        # status at the last change
+        self.since = now          # time of the last motion or step
+        self.lowPower = False     # low power mode set on the device
+
+class AdaptiveScheduler:
+    ''' Trigger each device at a rate that follows its motion '''
+
+    def __init__( self, sensors, rates = ( 100, 50, 20, 10, 5, 2),
+                  threshold = 3, hold = 1.0, delay = TFL_FRAME_TIME,
+                  lowPower = True):
+        if isinstance( sensors, SensorGroup):
+            sensors.open()
+        self.sensors = list( sensors)
+        self.rates = sorted( rates, reverse = True)
+        self.threshold = threshold  # cm of change that counts as motion
+        self.hold = hold            # still seconds before slowing down
+        self.delay = delay          # seconds from trigger to read
+        self.lowPower = lowPower
+        self.paces = {}             # id( sensor) -> `_Pace`
+
+    def __repr__( self):
+        return f"AdaptiveScheduler({self.sensors}, rates={self.rates})"
+
+    #  Current trigger rate of a device
+    def rate( self, sensor):
+        ''' Return the rate a device is triggered at now '''
+        pace = self.paces.get( id( sensor))
+        return self.rates[ pace.level if pace else 0]
+
+    #  Choose the next level of a device from its last frame
+    def _adapt( self, sensor, pace, now):
+        moved = sensor.status != pace.status or (
+                sensor.status == TFL_READY and
+                abs( sensor.dist - pace.ref) >= self.threshold)
+        if moved:
+            pace.ref = sensor.dist
+            pace.status = sensor.status
+            pace.level = 0
+            pace.since = now
+        elif now - pace.since >= self.hold and\
+             pace.level < len( self.rates) - 1:
+            pace.level += 1
+            pace.since = now
+        if self.lowPower:
+            self._setLowPower( sensor, pace,
+                               self.rates[ pace.level] <= TFL_LOW_POWER_FPS)
+
+    def _setLowPower( self, sensor, pace, on):
+        if pace.lowPower != on:
+            try:
+                sensor.setLowPower( on)
+                pace.lowPower = on
+            except OSError:
+                pass
+
+    def frames( self):
+        ''' Yield frames from all devices as they are read '''
+        events = []                # ( time, kind, order, sensor)
+        order = 0
+        now = time.monotonic()
+        for sensor in self.sensors:
+            self.paces[ id( sensor)] = _Pace( now)
+            heapq.heappush( events, ( now, _TRIGGER, order, sensor))
+            order += 1
+        due = {}                   # id( sensor) -> time of next trigger
+        switched = _triggerModes( self.sensors)
+        try:
+            while True:
+                when, kind, _, sensor = events[ 0]
+                now = time.monotonic()
+                if when > now:
+                    _sleep( when - now)
+                    continue
+                heapq.heappop( events)
+                pace = self.paces[ id( sensor)]
+                if kind == _TRIGGER:
+                    due[ id( sensor)] = when + 1 / self.rates[ pace.level]
+                    try:
+                        sensor.setTrigger()
+                        heapq.heappush( events, ( time.monotonic() + self.delay,
+                                                  _READ, order, sensor))
+                    except OSError:
+                        sensor.status = TFL_I2CWRITE
+                        if stats is not None:
+                            stats.addStatus( sensor.addr, TFL_I2CWRITE)
+                        heapq.heappush( events, ( due[ id( sensor)], _TRIGGER,
+                                                  order, sensor))
+                        yield sensor.frame()
+                    order += 1
+                    continue
+
+                try:
+                    sensor.readData()
+                except OSError:
+                    sensor.status = TFL_I2CREAD
+                    if stats is not None:
+                        stats.addStatus( sensor.addr, TFL_I2CREAD)
+                now = time.monotonic()
+                level = pace.level
+                self._adapt( sensor, pace, now)
+                if pace.level < level:     # speed up straight away
+                    due[ id( sensor)] = now
+                heapq.heappush( events, ( max( due[ id( sensor)], now),
+                                          _TRIGGER, order, sensor))
+                order += 1
+                yield sensor.frame()
+        finally:
+            for sensor in self.sensors:
+                pace = self.paces.get( id( sensor))
+                if pace is not None:
+                    self._setLowPower( sensor, pace, False)
+            _restoreModes( switched)
+#
+# - - - - - -   End of AdaptiveScheduler class  - - - - - - - -
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#                    ASYNCIO SUPPORT
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  Bus transactions block, so they run on one dedicated
+#  I/O thread for each I2C port.  Sharing the thread
+#  keeps every transaction on a port in order, and the
+#  event loop only ever waits on it with `await`.
+_workers = {}
+_workersLock = threading.Lock()
+
+def ioWorker( port):
+    ''' Return the I/O thread for an I2C port '''
+    with _workersLock:
+        worker = _workers.get( port)
+        if worker is None:
+            worker = ThreadPoolExecutor( 1,
+                         thread_name_prefix = f"tfli2c-i2c{port}")
+            _workers[ port] = worker
+    return worker
+
+#  An `AsyncTFLuna` wraps a `TFLuna` for use from an
+#  asyncio event loop:
+#      sensor = AsyncTFLuna( TFLuna( 0x10, 4))
+#      frame = await sensor.read()
+#      async for frame in sensor.frames( 50):
+#          ...
+#  Several sensors on one port share the port's I/O
+#  thread, so `asyncio.gather()` over their `read()`
+#  calls triggers them all, waits one period, and then
+#  reads them all, just like `SensorGroup.getData()`.
+class AsyncTFLuna:
+    ''' TF-Luna device for asyncio '''
+
+    def __init__( self, sensor, period = TFL_FRAME_TIME, worker = None):
+        self.sensor = sensor
+        self.period = period      # seconds from trigger to read
+        self.worker = worker or ioWorker( sensor.port)
+        self.missed = 0           # frames skipped by `frames()` to keep up
+
+    def __repr__( self):
+        return f"AsyncTFLuna({self.sensor!r})"
+
+    async def _call( self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor( self.worker, func, *args)
+
+    async def __aenter__( self):
+        await self._call( self.sensor.open)
+        return self
+
+    async def __aexit__( self, *exc):
+        await self._call( self.sensor.close)
+
+    async def begin( self):
+        return await self._call( self.sensor.begin)
+
+    #  Read and copy the frame on the I/O thread so that
+    #  the values can't change before they are returned.
+    def _readFrame( self):
+        self.sensor.readData()
+        return self.sensor.frame()
+
+    #  - - - -  Trigger, wait one period, then read  - - - -
+    async def read( self):
+        ''' Get one frame without blocking the event loop '''
+        await self._call( self.sensor.setTrigger)
+        await asyncio.sleep( self.period)
+        return await self._call( self._readFrame)
+
+    #  - - - -  Sample at `rate` frames per second  - - - -
+    #  A producer task samples on monotonic deadlines into
+    #  a queue of at most `maxsize` frames.  When a slow
+    #  consumer lets the queue fill up, sampling waits
+    #  rather than piling up frames.  An I2C error ends the
+    #  iteration by raising in the consumer.  Each frame
+    #  takes `period` plus the bus time, so `1 / rate` must
+    #  be longer than `period`; without a rate, frames are
+    #  read back to back.  A frame that is late starts at
+    #  once, and if sampling falls a whole frame behind the
+    #  missed frames are skipped and counted in `missed`.
+    async def frames( self, rate = None, maxsize = 16):
+        ''' Yield frames asynchronously '''
+        if rate and 1 / rate <= self.period:
+            raise ValueError( f"rate {rate} is too fast for a period " +
+                              f"of {self.period} s from trigger to read")
+        loop = asyncio.get_running_loop()
+        period = 1 / rate if rate else 0
+        queue = asyncio.Queue( maxsize)
+
+        async def produce():
+            due = loop.time()
+            try:
+                while True:
+                    await queue.put( await self.read())
+                    due += period
+                    delay = due - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep( delay)
+                    elif delay < -period:     # fell behind, so resync
+                        if period:
+                            self.missed += int( -delay / period)
+                        due = loop.time()
+            except Exception as error:
+                await queue.put( error)
+
+        task = loop.create_task( produce())
+        try:
+            while True:
+                item = await queue.get()
+                if isinstance( item, Exception):
+                    raise item
+                yield item
+        finally:
+            task.cancel()
+#
+# - - - - - -   End of AsyncTFLuna class  - - - - - - - -
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#                SIMULATED BUS BACKEND
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  `SimLuna` emulates the register map of one TF-Luna,
+#  0x00 to 0x29, and `SimBus` emulates an I2C bus with
+#  any number of them attached.  Together they let the
+#  module run and be measured without any hardware:
+#      buses = tfl.simulate( [ 0x10, 0x11], ports = [ 4])
+#      with tfl.SensorGroup( [ 0x10, 0x11], 4) as group:
+#          group.getData()
+#
+#  The emulator follows the device closely enough for
+#  load tests and benchmarks:
+#    - trigger mode measures once, `latency` seconds after
+#      each trigger; continuous mode measures at `fps`
+#    - the tick register counts milliseconds since reset,
+#      on a clock that runs `drift` (s/s) fast
+#    - `saveSettings()` copies the settings to flash, and
+#      a soft reset reloads them, which is how a new
+#      address or a saved frame rate takes effect
+#    - a hard reset restores the factory settings
+#    - the device does not answer while it saves or resets
+#  Distance is `dist` (a number, or a function of time in
+#  seconds) plus gaussian noise of `noise` cm.
+#  Faults can be injected with `failRate`, the chance that
+#  any one transaction fails, and `offline`, which makes
+#  the device stop answering altogether.
+class SimLuna:
+    ''' Emulated TF-Luna register map '''
+
+    #  Settings registers kept in flash
+    settings = ( TFL_SET_I2C_ADDR, TFL_SET_MODE, TFL_DISABLE,
+                 TFL_FPS_LO, TFL_FPS_HI, TFL_SET_LO_PWR)
+
+    def __init__( self, addr = 0x10, dist = 100, flux = 1000, noise = 0.5,
+                  latency = 0.002, fps = 100, temp = 40.0,
+                  prodCode = 'SIMLUNA0000001', version = ( 3, 2, 1),
+                  saveTime = 0.2, resetTime = 0.5,
+                  failRate = 0.0, seed = None, drift = 0.0):
+        self.dist = dist
+        self.flux = flux
+        self.noise = noise
+        self.latency = latency         # seconds from trigger to result
+        self.temp = temp
+        self.saveTime = saveTime
+        self.resetTime = resetTime
+        self.failRate = failRate
+        self.drift = drift             # device clock rate error
+        self.offline = False
+        self.random = random.Random( seed)
+        self.transactions = 0
+
+        self.regs = bytearray( TFL_REG_COUNT)
+        self.regs[ TFL_VER_REV] = version[ 2]
+        self.regs[ TFL_VER_MIN] = version[ 1]
+        self.regs[ TFL_VER_MAJ] = version[ 0]
+        code = prodCode.encode( 'ascii')[ :14].ljust( 14, b'\0')
+        self.regs[ TFL_PROD_CODE : TFL_PROD_CODE + 14] = code
+        self.factory = { TFL_SET_I2C_ADDR: 0x10, TFL_SET_MODE: 0,
+                         TFL_DISABLE: 0, TFL_FPS_LO: 100, TFL_FPS_HI: 0,
+                         TFL_SET_LO_PWR: 0}
+        self.flash = dict( self.factory)
+        self.flash[ TFL_SET_I2C_ADDR] = addr
+        self.flash[ TFL_FPS_LO] = fps & 0xFF
+        self.flash[ TFL_FPS_HI] = fps >> 8
+        self._boot( time.monotonic())
+        self.busyUntil = 0.0
+
+    def __repr__( self):
+        return f"SimLuna(addr=0x{self.addr:02X})"
+
+    #  Address the device answers to, until the next reset
+    @property
+    def addr( self):
+        return self.bootAddr
+
+    #  Load the settings from flash and restart the clock
+    def _boot( self, now):
+        self.regs[ TFL_DIST_LO : TFL_TICK_LO + 2] = bytes( TFL_TICK_LO + 2)
+        for reg, value in self.flash.items():
+            self.regs[ reg] = value
+        self.bootAddr = self.regs[ TFL_SET_I2C_ADDR]
+        self.bootTime = now
+        self.pending = None            # time a triggered result is ready
+        self.frameCount = -1           # last continuous frame measured
+
+    def _check( self, now):
+        if self.offline or now < self.busyUntil or\
+           ( self.failRate and self.random.random() < self.failRate):
+            raise OSError( errno.EREMOTEIO, os.strerror( errno.EREMOTEIO))
+        self.transactions += 1
+
+    #  Store one measurement made at host time `when`
+    def _measure( self, when):
+        regs = self.regs
+        dist = self.dist( when) if callable( self.dist) else self.dist
+        if self.noise:
+            dist = self.random.gauss( dist, self.noise)
+        dist = min( max( int( round( dist)), 0), 0xFFFF)
+        flux = self.flux( when) if callable( self.flux) else self.flux
+        tempRaw = int( round( self.temp * 100)) & 0xFFFF
+        tick = int( ( when - self.bootTime) * ( 1 + self.drift) * 1000) & 0xFFFF
+        for reg, value in ( ( TFL_DIST_LO, dist), ( TFL_FLUX_LO, flux),
+                            ( TFL_TEMP_LO, tempRaw), ( TFL_TICK_LO, tick)):
+            regs[ reg] = value & 0xFF
+            regs[ reg + 1] = ( value >> 8) & 0xFF
+
+    #  Bring the measurement registers up to date
+    def _update( self, now):
+        if self.regs[ TFL_DISABLE]:
+            return
+        if self.regs[ TFL_SET_MODE] == 0:
+            fps = self.regs[ TFL_FPS_LO] + ( self.regs[ TFL_FPS_HI] << 8)
+            if fps:
+                count = int( ( now - self.bootTime) * fps)
+                if count != self.frameCount:
+                    self.frameCount = count
+                    self._measure( self.bootTime + count / fps)
+        elif self.pending is not None and now >= self.pending:
+            self._measure( self.pending)
+            self.pending = None
+
+    #  - - - -  Register access from the bus  - - - -
+    def read( self, reg, length):
+        now = time.monotonic()
+        self._check( now)
+        if reg < TFL_SAVE_SETTINGS:
+            self._update( now)
+        data = list( self.regs[ reg : reg + length])
+        return data + [ 0] * ( length - len( data))
+
+    def write( self, reg, data):
+        now = time.monotonic()
+        self._check( now)
+        for offset, value in enumerate( data):
+            self._writeReg( reg + offset, value, now)
+
+    def _writeReg( self, reg, value, now):
+        if reg == TFL_TRIGGER:
+            if value == 1 and self.regs[ TFL_SET_MODE] == 1:
+                self._update( now)         # finish an earlier trigger
+                self.pending = now + self.latency
+        elif reg == TFL_SAVE_SETTINGS:
+            if value == 1:
+                for key in self.settings:
+                    self.flash[ key] = self.regs[ key]
+                self.busyUntil = now + self.saveTime
+        elif reg == TFL_SOFT_RESET:
+            if value == 2:
+                self._boot( now)
+                self.busyUntil = now + self.resetTime
+        elif reg == TFL_HARD_RESET:
+            if value == 1:
+                self.flash = dict( self.factory)
+                self._boot( now)
+                self.busyUntil = now + self.saveTime + self.resetTime
+        elif reg in self.settings:
+            self.regs[ reg] = value & 0xFF
+            if reg == TFL_SET_MODE:
+                self.frameCount = -1
+#
+# - - - - - -   End of SimLuna class  - - - - - - - -
+
+#  A `SimBus` routes transactions to the `SimLuna`
+#  devices attached to it.  An address with no device
+#  fails the way a real bus does, with `OSError`.
+#  `byteTime` adds a delay for every byte moved, to
+#  imitate the bus clock (about 0.0001 at 100kHz).
+class SimBus:
+    ''' Emulated I2C bus '''
+
+    def __init__( self, port = 4, devices = (), byteTime = 0.0):
+        self.port = port
+        self.devices = list( devices)
+        self.byteTime = byteTime
+        self.lock = threading.Lock()
+
+    def __repr__( self):
+        return f"SimBus(port={self.port}, devices={self.devices})"
+
+    def add( self, device):
+        self.devices.append( device)
+        return device
+
+    def device( self, addr):
+        for device in self.devices:
+            if device.addr == addr:
+                return device
+        raise OSError( errno.EREMOTEIO, os.strerror( errno.EREMOTEIO))
+
+    #  Devices that share an address all take part in a
+    #  transaction, as on a real bus: each one receives
+    #  every write, and a read returns the AND of what
+    #  they send, since the bus is open drain.  It fails
+    #  only if none of them answers.
+    def _write( self, addr, reg, data):
+        devices = [ device for device in self.devices if device.addr == addr]
+        if len( devices) < 2:
+            return self.device( addr).write( reg, data)
+        self._each( devices, lambda device: device.write( reg, data))
+
+    def _read( self, addr, reg, length):
+        devices = [ device for device in self.devices if device.addr == addr]
+        if len( devices) < 2:
+            return self.device( addr).read( reg, length)
+        data = [ 0xFF] * length
+        for sent in self._each( devices,
+                                lambda device: device.read( reg, length)):
+            data = [ a & b for a, b in zip( data, sent)]
+        return data
+
+    def _each( self, devices, call):
+        results = []
+        for device in devices:
+            try:
+                results.append( call( device))
+            except OSError:
+                pass
+        if not results:
+            raise OSError( errno.EREMOTEIO, os.strerror( errno.EREMOTEIO))
+        return results
+
+    def _wait( self, length):
+        if self.byteTime:
+            time.sleep( self.byteTime * ( length + 2))  # address, register
+
+    #  - - - -  The SMBus methods  - - - -
+    def write_quick( self, addr):
+        with self.lock:
+            self._wait( 0)
+            self._read( addr, 0, 0)
+
+    def read_byte_data( self, addr, reg):
+        with self.lock:
+            self._wait( 1)
+            return self._read( addr, reg, 1)[ 0]
+
+    def write_byte_data( self, addr, reg, value):
+        with self.lock:
+            self._wait( 1)
+            self._write( addr, reg, [ value])
+
+    def read_word_data( self, addr, reg):
+        with self.lock:
+            self._wait( 2)
+            lo, hi = self._read( addr, reg, 2)
+            return lo + ( hi << 8)
+
+    def write_word_data( self, addr, reg, value):
+        with self.lock:
+            self._wait( 2)
+            self._write( addr, reg, [ value & 0xFF, ( value >> 8) & 0xFF])
+
+    def read_i2c_block_data( self, addr, reg, length = 32):
+        if length > 32:
+            raise OSError( errno.EINVAL, os.strerror( errno.EINVAL))
+        with self.lock:
+            self._wait( length)
+            return self._read( addr, reg, length)
+
+    def write_i2c_block_data( self, addr, reg, data):
+        with self.lock:
+            self._wait( len( data))
+            self._write( addr, reg, data)
+
+    #  - - - -  Batches, as `RdwrBus` has  - - - -
+    def writeMany( self, items):
+        with self.lock:
+            self._wait( 2 * len( items))
+            for addr, reg, value in items:
+                self._write( addr, reg, [ value])
+
+    def readMany( self, items):
+        with self.lock:
+            self._wait( sum( 2 + length for addr, reg, length in items))
+            return [ self._read( addr, reg, length)
+                     for addr, reg, length in items]
+
+    def close( self):
+        pass
+#
+# - - - - - -   End of SimBus class  - - - - - - - -
+
+#  Attach a `SimLuna` at each address in `addrs` to a
+#  `SimBus` for each port in `ports`, and make them the
+#  bus backend.  Keyword options are passed to every
+#  `SimLuna`.  Return a dictionary of buses by port.
+def simulate( addrs = ( 0x10,), ports = ( 4,), byteTime = 0.0, **options):
+    ''' Use simulated devices in place of real I2C buses '''
+    buses = {}
+    for port in ports:
+        buses[ port] = SimBus( port, [ SimLuna( addr, **options)
+                                       for addr in addrs], byteTime)
+    def factory( port):
+        if port not in buses:
+            raise FileNotFoundError( errno.ENOENT, os.strerror( errno.ENOENT),
+                                     f"/dev/i2c-{port}")
+        return buses[ port]
+    setBackend( factory)
+    return buses
+
+
+#  Return the default device, creating it on first use
+#  from the `tflAddr` and `tflPort` settings.
+def _device():
+    global device
+    if device is None:
+        device = TFLuna( tflAddr, tflPort)
+    return device
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - -
 #             GET DATA FROM THE DEVICE
@@ -132,167 +3118,142 @@ def getData():
     #  1. Make data and status variables global
     global status, dist, flux, temp
 
-    #  2. Get data from the device.
-    bus = SMBus( tflPort)    #  Open I2C communication
-    # Trigger a one-shot data sample
-    bus.write_byte_data( tflAddr, TFL_TRIGGER, 1)
-    #  Read the first six registers
-    frame = bus.read_i2c_block_data( tflAddr, 0, 6)
-    bus.close()              #  Close I2C communication
-
-    #  3. Shift data from read array into the three variables
-    dist = frame[ 0] + ( frame[ 1] << 8)
-    flux = frame[ 2] + ( frame[ 3] << 8)
-    temp = frame[ 4] + ( frame[ 5] << 8)
-    # Convert temp to degrees from hundredths
-    temp = ( temp / 100)
-    # Convert Celsius to Fahrenheit
-    #temp = ( temp * 9 / 5) + 32
-
-    #  4.  Evaluate Abnormal Data Values
-    if( dist == -1):
-        status = TFL_WEAK
-        return False
-    elif( flux < 100):         # Signal strength < 100
-        status = TFL_WEAK
-        return False
-    elif( flux > 0x8000):      # Ambient light too strong
-        status = TFL_FLOOD
-        return False
-    elif( flux == 0xFFFF):     # Signal saturation
-        status = TFL_STRONG
-        return False
+    #  2. Get data from the default device
+    tfl = _device()
+    result = tfl.getData()
 
-    #  5. Set Ready status and go home
-    status = TFL_READY
-    return True
+    #  3. Copy the results into the module variables
+    dist, flux, temp = tfl.dist, tfl.flux, tfl.temp
+    status = tfl.status
+    return result
 #
 # - - - - - -   End of getData() function  - - - - - - - -
 
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#          STREAM FRAMES IN CONTINUOUS MODE
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  Yield a `Frame` for every new measurement of the
+#  default device and keep the module variables current.
+def stream( fps = 100):
+    ''' Yield new frames in continuous mode '''
+    global status, dist, flux, temp
+    frames = _device().stream( fps)
+    try:
+        for frame in frames:
+            dist, flux, temp = frame.dist, frame.flux, frame.temp
+            status = frame.status
+            yield frame
+    finally:
+        frames.close()
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - -
 #              EXPLICIT COMMANDS
 # - - - - - - - - - - - - - - - - - - - - - - - - - -
 #  - - - - -    SAVE SETTINGS   - - - - -
-def saveSettings():
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_SAVE_SETTINGS, 1)
-    bus.close()
+#  With `wait = True`, return when the device answers again
+def saveSettings( wait = False):
+    return _device().saveSettings( wait)
 
 #  - - - -   SOFT RESET aka Reboot  - - - -
-def softReset():
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_SOFT_RESET, 2)
-    bus.close()
+def softReset( wait = False):
+    return _device().softReset( wait)
 
 #  - - - -   HARD RESET to Factory Defaults  - - - -
-def hardReset():
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_HARD_RESET, 1)
-    bus.close()
+def hardReset( wait = False):
+    return _device().hardReset( wait)
+
+#  - - - -   WAIT FOR THE DEVICE TO ANSWER  - - - -
+#  Return `True` as soon as the device answers again
+#  after a reset, or `False` after `timeout` seconds.
+def waitReady( timeout = 3.0):
+    return _device().waitReady( timeout)
 
 #  - - - - - -    SET I2C ADDRESS   - - - - - -
 #  Range: 0x08, 0x77.  Must be followed by
 #  `saveSettings()` and 'softReset()` commands
 def setI2Caddr( addrNew):
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_SET_I2C_ADDR, addrNew)
-    bus.close()
+    _device().setI2Caddr( addrNew)
 
 #  - - - - -   SET ENABLE   - - - - -
 #  Turn on LiDAR
 #  Must be followed by Save and Reset commands
 def setEnable():
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_DISABLE, 0)
-    bus.close()
+    _device().setEnable()
 
 #  - - - - -   SET DISABLE   - - - - -
 #  Turn off LiDAR
 #  Must be followed by Save and Reset commands
 def setDisable():
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_DISABLE, 1)
-    bus.close()
+    _device().setDisable()
 
 #  - - - - - -   SET CONTINUOUS MODE   - - - - - -
 #  Continuous ranging mode
 #  Must be followed by Save and Reset commands
 def setModeCont():
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_SET_MODE, 0)
-    bus.close()
+    _device().setModeCont()
 
 #  - - - - - -   SET TRIGGER MODE   - - - - - -
 #  Sample range only once when triggered
 #  Must be followed by Save and Reset commands
 def setModeTrig():
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_SET_MODE, 1)
-    bus.close()
+    _device().setModeTrig()
 
 #  - - - - - -   GET TRIGGER MODE   - - - - - -
 #  Return mode type as a string.
 def getMode():
-    bus = SMBus( tflPort)
-    mode = bus.read_byte_data( tflAddr, TFL_SET_MODE)
-    bus.close()
-    if mode == 0: return 'continuous'
-    else:         return 'trigger'
+    return _device().getMode()
 
 #  - - - - - -   SET TRIGGER   - - - - - =
 #  Trigger device to sample one time.
 def setTrigger():
-    bus = SMBus( tflPort)
-    bus.write_byte_data( tflAddr, TFL_TRIGGER, 1)
-    bus.close()
+    _device().setTrigger()
 
 #  - - - - -    SET FRAME RATE   - - - - - -
 #  Write `fps` (frames per second) to device
 #  Command must be followed by `saveSettings()`
 #  and `softReset()` commands.
 def setFrameRate( fps):
-    bus = SMBus( tflPort)
-    bus.write_word_data( tflAddr, TFL_FPS_LO, ( fps))
-    bus.close()
+    _device().setFrameRate( fps)
 
 #  - - - - -    GET FRAME RATE   - - - - - -
 #  Return two-byte Frame Rate (frames per second) value
 def getFrameRate():
-    bus = SMBus( tflPort)
-    fps = bus.read_word_data( tflAddr, TFL_FPS_LO)
-    bus.close()
-    return fps
+    return _device().getFrameRate()
+
+#  - - - - -    GET I2C ADDRESS   - - - - - -
+#  Return the device address setting register
+def getI2Caddr():
+    return _device().getI2Caddr()
 
 #  - - - -  GET DEVICE TIME (in milliseconds) - - -
 #  Return two-byte value of milliseconds since last reset.
 def getTime():
-    bus = SMBus( tflPort)        #  Open I2C communication
-    tim = bus.read_word_data( tflAddr, TFL_TICK_LO)     #  Get two bytes of time+
-    bus.close()                  #  Close I2C communication
-    return tim
+    return _device().getTime()
 
 #  - -  GET PRODUCTION CODE (Serial Number) - - -
 #  Return 14 ascii characters of serial number
 def getProdCode():
-    prodcode = ''
-    bus = SMBus( tflPort)   #  Open I2C communication
-    for i in range( 14):    #  Build the 'production code' string
-        prodcode += chr(bus.read_byte_data( tflAddr, TFL_PROD_CODE + i))
-    bus.close()             #  Close I2C communication
-    return prodcode
+    return _device().getProdCode()
 
 #  - - - -    GET FIRMWARE VERSION   - - - -
 #  Return version as a string
 def getFirmwareVersion():
-    version = ''
-    bus = SMBus( tflPort)      #  Open I2C communication
-    #  Build the 'version' string
-    version =\
-        str( bus.read_byte_data( tflAddr, TFL_VER_MAJ)) + '.' +\
-        str( bus.read_byte_data( tflAddr, TFL_VER_MIN)) + '.' +\
-        str( bus.read_byte_data( tflAddr, TFL_VER_REV))
-    bus.close()             #  Close I2C communication
-    return version          #  Return the version string
+    return _device().getFirmwareVersion()
+
+#  - - - -    APPLY A CONFIGURATION   - - - -
+#  Write, save and verify only the changed settings.
+#  A new address becomes the module's `tflAddr`.
+def apply( config, reset = True):
+    global tflAddr
+    tfl = _device()
+    result = tfl.apply( config, reset)
+    tflAddr = tfl.addr
+    return result
+
+#  - - - -    GET REGISTER SNAPSHOT   - - - -
+#  Return all device registers as a `Snapshot`
+def snapshot():
+    return _device().snapshot()
 
 # - - - - - - - - - - - - - - - - - - - - -
 
@@ -305,24 +3266,7 @@ def getFirmwareVersion():
 #  Print status condition either 'READY' or error type
 def printStatus():
     ''' Print status condition'''
-    global status
-
-    print("Status: ", end= '')
-    if( status == TFMP_READY):       print( "READY", end= '')
-    elif( status == TFMP_SERIAL):    print( "SERIAL", end= '')
-    elif( status == TFMP_HEADER):    print( "HEADER", end= '')
-    elif( status == TFMP_CHECKSUM):  print( "CHECKSUM", end= '')
-    elif( status == TFMP_TIMEOUT):   print( "TIMEOUT", end= '')
-    elif( status == TFMP_PASS):      print( "PASS", end= '')
-    elif( status == TFMP_FAIL):      print( "FAIL", end= '')
-    elif( status == TFMP_I2CREAD):   print( "I2C-READ", end= '')
-    elif( status == TFMP_I2CWRITE):  print( "I2C-WRITE", end= '')
-    elif( status == TFMP_I2CLENGTH): print( "I2C-LENGTH", end= '')
-    elif( status == TFMP_WEAK):      print( "Signal weak", end= '')
-    elif( status == TFMP_STRONG):    print( "Signal saturation", end= '')
-    elif( status == TFMP_FLOOD):     print( "Ambient light saturation", end= '')
-    else:                            print( "OTHER", end= '')
-    print()
+    print( "Status: " + TFL_STATUS_TEXT.get( status, "OTHER"))
 
 
 #  - - - -   For test and troubleshooting:   - - - -
@@ -337,9 +3281,489 @@ print()
 # 0s to the length of 'padding'
 #  - - - - - - - - - - - - - - - - - - - - - - - - -
 
-# If this module is executed by itself
-if __name__ == "__main__":
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#         ACQUISITION DAEMON AND SHARED MEMORY RING
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  Only one process should own the bus.  A `Daemon` owns
+#  every sensor and publishes each frame into a ring of
+#  fixed size slots in `multiprocessing.shared_memory`.
+#  Any number of local processes can then read the latest
+#  or earlier frames with a `SharedReader`, with no extra
+#  I2C traffic and no serialization:
+#      python -m tfli2c daemon --bus 4:0x10,0x11 1:0x10
+#  and in each consumer:
+#      reader = tfl.SharedReader()
+#      for record in reader.follow():
+#          print( record.sensor, record.dist)
+#
+#  Layout: a 4096 byte header, then `capacity` slots.
+#  The header holds the magic, format version, capacity,
+#  slot size, the length of a JSON table of the sensors
+#  as [ port, addr] pairs, the number of frames written
+#  so far, and then the table itself.  Each 32 byte slot
+#  holds the frame's sequence number (1, 2, 3...) and the
+#  same fields as a `Recorder` record, where `sensor` is
+#  the index into the sensor table.  The writer clears
+#  the sequence number of a slot before changing it and
+#  sets it afterwards, so a reader that sees the same
+#  number before and after copying a slot has a whole frame.
+TFL_SHM_NAME   = 'tfli2c'
+TFL_SHM_MAGIC  = b'TFLSHM\0\0'
+TFL_SHM_HEADER = struct.Struct( '<8sIIIIQ')     # then the sensor table
+TFL_SHM_DATA   = 4096                           # offset of slot 0
+TFL_SHM_SLOT   = struct.Struct( '<QdHHHHBB6x')  # 32 bytes
+TFL_SHM_COUNT  = 24                             # offset of frames written
+
+Record = namedtuple( 'Record', 'seq ' + ' '.join( TFL_REC_FIELDS))
+
+#  Attach to shared memory without letting this process's
+#  resource tracker remove it when the process exits
+def _attachShm( name):
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory( name, track = False)
+    except TypeError:                    # Python before 3.13
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory( name)
+        resource_tracker.unregister( shm._name, 'shared_memory')
+        return shm
+
+class SharedRing:
+    ''' Writer side of the shared memory frame ring '''
+
+    def __init__( self, sensors, name = TFL_SHM_NAME, capacity = 1 << 16):
+        from multiprocessing import shared_memory
+        table = json.dumps( [ list( sensor) for sensor in sensors]).encode()
+        if TFL_SHM_HEADER.size + len( table) > TFL_SHM_DATA:
+            raise ValueError( "too many sensors for the shared memory header")
+        size = TFL_SHM_DATA + capacity * TFL_SHM_SLOT.size
+        self.lock = _lockRing( name)
+        try:
+            try:
+                self.shm = shared_memory.SharedMemory( name, True, size)
+            except FileExistsError:      # left over from an earlier run
+                old = shared_memory.SharedMemory( name)
+                old.close()
+                old.unlink()
+                self.shm = shared_memory.SharedMemory( name, True, size)
+        except BaseException:
+            self.lock.close()
+            raise
+        self.capacity = capacity
+        self.count = 0
+        TFL_SHM_HEADER.pack_into( self.shm.buf, 0, TFL_SHM_MAGIC, 1, capacity,
+                                  TFL_SHM_SLOT.size, len( table), 0)
+        self.shm.buf[ TFL_SHM_HEADER.size :
+                      TFL_SHM_HEADER.size + len( table)] = table
+
+    def publish( self, stamp, tick, dist, flux, tempRaw, status, sensor):
+        buf = self.shm.buf
+        seq = self.count + 1
+        offset = TFL_SHM_DATA + self.count % self.capacity * TFL_SHM_SLOT.size
+        struct.pack_into( '<Q', buf, offset, 0)            # slot is changing
+        TFL_SHM_SLOT.pack_into( buf, offset, 0, stamp, tick, dist, flux,
+                                tempRaw, status, sensor)
+        struct.pack_into( '<Q', buf, offset, seq)
+        struct.pack_into( '<Q', buf, TFL_SHM_COUNT, seq)
+        self.count = seq
+
+    def close( self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.lock.close()
+
+#  Only one process may own a ring.  The owner holds an
+#  exclusive lock on a file named after the ring for as
+#  long as it runs; the lock goes with the process, so a
+#  ring left by a process that died can be taken over.
+def _lockRing( name):
+    import fcntl, tempfile
+    path = os.path.join( tempfile.gettempdir(), f"tfli2c-{name}.lock")
+    lock = open( path, 'a+')
+    try:
+        fcntl.flock( lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        raise OSError( errno.EBUSY, f"shared memory '{name}' is owned " +
+                       "by another running daemon") from None
+    lock.seek( 0)
+    lock.truncate()
+    lock.write( f"{os.getpid()}\n")
+    lock.flush()
+    return lock
+
+class SharedReader:
+    ''' Reader side of the shared memory frame ring '''
+
+    def __init__( self, name = TFL_SHM_NAME):
+        self.shm = _attachShm( name)
+        magic, version, self.capacity, slot, tableLen, count =\
+            TFL_SHM_HEADER.unpack_from( self.shm.buf, 0)
+        if magic != TFL_SHM_MAGIC or slot != TFL_SHM_SLOT.size:
+            raise ValueError( f"'{name}' is not a tfli2c frame ring")
+        table = bytes( self.shm.buf[ TFL_SHM_HEADER.size :
+                                     TFL_SHM_HEADER.size + tableLen])
+        self.sensors = [ tuple( sensor) for sensor in json.loads( table)]
+
+    def __repr__( self):
+        return f"SharedReader({self.shm.name!r}, sensors={self.sensors})"
+
+    def close( self):
+        self.shm.close()
+
+    @property
+    def count( self):
+        ''' Number of frames written so far '''
+        return struct.unpack_from( '<Q', self.shm.buf, TFL_SHM_COUNT)[ 0]
+
+    #  Return frame number `seq`, or None if it has been
+    #  overwritten or is being written.
+    def get( self, seq):
+        offset = TFL_SHM_DATA + ( seq - 1) % self.capacity * TFL_SHM_SLOT.size
+        fields = TFL_SHM_SLOT.unpack_from( self.shm.buf, offset)
+        after = struct.unpack_from( '<Q', self.shm.buf, offset)[ 0]
+        if fields[ 0] != seq or after != seq:
+            return None
+        return Record( *fields)
+
+    def latest( self):
+        ''' Return the newest frame, or None '''
+        count = self.count
+        return self.get( count) if count else None
+
+    #  All frames after number `since` that are still in
+    #  the ring, oldest first
+    def since( self, since = 0):
+        ''' Return the frames written after `since` '''
+        count = self.count
+        first = max( since + 1, count - self.capacity + 1, 1)
+        records = ( self.get( seq) for seq in range( first, count + 1))
+        return [ record for record in records if record is not None]
+
+    #  Yield every new frame, polling every `interval` s
+    def follow( self, interval = 0.002, since = None):
+        ''' Yield frames as they are published '''
+        seq = self.count if since is None else since
+        while True:
+            records = self.since( seq)
+            if records:
+                seq = records[ -1].seq
+                yield from records
+            else:
+                time.sleep( interval)
+
+    #  NumPy structured array of all slots, sharing the
+    #  shared memory.  Slots are in ring order, not time order.
+    def view( self):
+        ''' Return a NumPy view of the ring '''
+        if numpy is None:
+            raise ImportError( "SharedReader.view() requires numpy")
+        dtype = numpy.dtype( { 'names': Record._fields,
+            'formats': [ '<u8', '<f8', '<u2', '<u2', '<u2', '<u2', 'u1', 'u1'],
+            'itemsize': TFL_SHM_SLOT.size})
+        return numpy.frombuffer( self.shm.buf, dtype, self.capacity,
+                                 TFL_SHM_DATA)
+
+#  - - - -  The daemon  - - - -
+#  `ports` is a dictionary of device addresses by port, as
+#  for `MultiBus`.  `run()` samples every port in parallel
+#  and publishes every frame until `stop()` is called,
+#  from another thread or a signal handler.
+class Daemon:
+    ''' Single owner of the sensors, publishing to shared memory '''
+
+    def __init__( self, ports, rate = 50, name = TFL_SHM_NAME,
+                  capacity = 1 << 16):
+        self.sensors = [ ( port, addr) for port, addrs in ports.items()
+                         for addr in addrs]
+        self.index = { sensor: i for i, sensor in enumerate( self.sensors)}
+        self.ring = SharedRing( self.sensors, name, capacity)  # owner first
+        self.multi = MultiBus( ports, rate)
+        self.running = False
+
+    def run( self):
+        ''' Publish frames until stopped '''
+        self.running = True
+        with self.multi:
+            for rnd in self.multi.rounds():
+                for port, frames in rnd.frames.items():
+                    for frame in frames:
+                        stamp = _wallTime( frame.time)
+                        self.ring.publish( stamp, frame.tick or 0, frame.dist,
+                            frame.flux, int( round( frame.temp * 100)) & 0xFFFF,
+                            frame.status, self.index[ ( port, frame.addr)])
+                if not self.running:
+                    break
+
+    def stop( self):
+        self.running = False
+        self.multi.close()
+
+    def close( self):
+        self.ring.close()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#                   BENCHMARK SUITE
+# - - - - - - - - - - - - - - - - - - - - - - - - - -
+#  Run with:  python -m tfli2c bench [options]
+#  Each case runs for `seconds` and reports samples per
+#  second, per-call latency percentiles, I2C transactions
+#  and bytes per sample and CPU time per sample.  Results
+#  can be written as JSON to compare versions.
+#  A sample is a new measurement: a read straight after
+#  a trigger can return the last measurement again, so
+#  only a frame whose tick has changed counts, or any
+#  frame read without the tick.  In the `snapshot` case
+#  each snapshot counts.
+
+#  Run `call()` repeatedly for `seconds`; `call()` returns
+#  the number of samples it produced.
+def _measure( name, call, counts, seconds):
+    latency = []
+    samples = 0
+    counts.reset()
+    cpu = time.process_time()
+    start = now = time.perf_counter()
+    while now - start < seconds:
+        samples += call()
+        done = time.perf_counter()
+        latency.append( done - now)
+        now = done
+    cpu = time.process_time() - cpu
+    elapsed = now - start
+    transactions, size = counts.totals()
+    latency.sort()
+    pick = lambda q: latency[ min( int( q * len( latency)), len( latency) - 1)]
+    samples = max( samples, 1)
+    return { 'case': name,
+             'samples': samples,
+             'calls': len( latency),
+             'seconds': elapsed,
+             'callsPerSecond': len( latency) / elapsed,
+             'samplesPerSecond': samples / elapsed,
+             'latencyP50': pick( 0.50),
+             'latencyP90': pick( 0.90),
+             'latencyP99': pick( 0.99),
+             'latencyMax': latency[ -1],
+             'transactionsPerSample': transactions / samples,
+             'bytesPerSample': size / samples,
+             'cpuPerSample': cpu / samples}
+
+BENCH_CASES = ( 'getData', 'snapshot', 'group', 'stream')
+
+#  Count the devices with a new frame since the last
+#  call, keeping the last ticks in `ticks`
+def _newFrames( sensors, ticks):
+    count = 0
+    for sensor in sensors:
+        if sensor.tick is None or sensor.tick != ticks.get( id( sensor)):
+            ticks[ id( sensor)] = sensor.tick
+            count += 1
+    return count
+
+#  - - - -  Run the benchmark cases  - - - -
+#  Return a list of result dictionaries, one per case.
+def bench( addrs = ( 0x10,), port = 4, seconds = 2.0, cases = BENCH_CASES,
+           fps = 250):
+    ''' Measure the acquisition paths '''
+    results = []
+    counts = Stats()
+    bus = InstrumentedBus( openBus( port), counts)
+    sensor = TFLuna( addrs[ 0], port, bus)
+    group = SensorGroup( addrs, port, bus)
+    try:
+        if not group.begin():
+            raise OSError( errno.ENODEV, "device not ready on port " +
+                           str( port))
+        for name in cases:
+            ticks = {}
+            if name == 'getData':
+                def call():
+                    sensor.getData()
+                    return _newFrames( [ sensor], ticks)
+            elif name == 'snapshot':
+                def call():
+                    sensor.snapshot()
+                    return 1
+            elif name == 'group':
+                def call():
+                    group.getData()
+                    return _newFrames( group.sensors, ticks)
+            elif name == 'stream':
+                frames = sensor.stream( fps)
+                def call():
+                    next( frames)
+                    return 1
+            else:
+                raise ValueError( "unknown benchmark case: " + name)
+            results.append( _measure( name, call, counts, seconds))
+            if name == 'stream':
+                frames.close()
+    finally:
+        bus.close()
+    return results
+
+#  - - - -  Command line entry point  - - - -
+#      python -m tfli2c bench [options]
+#      python -m tfli2c daemon [options]
+def main( argv = None):
+    import argparse
+    parser = argparse.ArgumentParser( prog = 'python -m tfli2c',
+        description = "Benewake TF-Luna in I2C mode")
+    commands = parser.add_subparsers( dest = 'command')
+    cmd = commands.add_parser( 'bench', help = "run the benchmark suite")
+    cmd.add_argument( '--port', type = int, default = tflPort,
+                      help = "I2C port number (default %(default)s)")
+    cmd.add_argument( '--addr', type = lambda x: int( x, 0), nargs = '+',
+                      default = [ tflAddr], help = "device addresses")
+    cmd.add_argument( '--seconds', type = float, default = 2.0,
+                      help = "time for each case (default %(default)s)")
+    cmd.add_argument( '--case', choices = BENCH_CASES, nargs = '+',
+                      default = list( BENCH_CASES), help = "cases to run")
+    cmd.add_argument( '--fps', type = int, default = 250,
+                      help = "frame rate for the stream case")
+    cmd.add_argument( '--sim', action = 'store_true',
+                      help = "use simulated devices instead of a real bus")
+    cmd.add_argument( '--byte-time', type = float, default = 0.0,
+                      help = "simulated seconds per bus byte")
+    cmd.add_argument( '--json', metavar = 'FILE',
+                      help = "write results as JSON ('-' for stdout)")
+
+    cmd = commands.add_parser( 'daemon',
+                               help = "own the sensors and publish frames")
+    cmd.add_argument( '--bus', metavar = 'PORT:ADDR,ADDR', nargs = '+',
+                      default = [ f"{tflPort}:0x{tflAddr:02X}"],
+                      help = "port and device addresses, e.g. 4:0x10,0x11")
+    cmd.add_argument( '--rate', type = float, default = 50,
+                      help = "rounds per second (default %(default)s)")
+    cmd.add_argument( '--name', default = TFL_SHM_NAME,
+                      help = "shared memory name (default %(default)s)")
+    cmd.add_argument( '--capacity', type = int, default = 1 << 16,
+                      help = "frames kept in the ring (default %(default)s)")
+    cmd.add_argument( '--sim', action = 'store_true',
+                      help = "use simulated devices instead of a real bus")
+
+    cmd = commands.add_parser( 'scan', help = "find the devices on every bus")
+    cmd.add_argument( '--port', type = int, nargs = '+',
+                      help = "I2C port numbers (default every /dev/i2c-*)")
+    cmd.add_argument( '--sim', action = 'store_true',
+                      help = "use simulated devices instead of a real bus")
+
+    cmd = commands.add_parser( 'provision',
+        help = "give devices that share an address unique addresses")
+    cmd.add_argument( '--port', type = int, default = tflPort,
+                      help = "I2C port number (default %(default)s)")
+    cmd.add_argument( '--count', type = int, default = 1,
+                      help = "number of devices to connect in turn")
+    cmd.add_argument( '--start', type = lambda x: int( x, 0), default = 0x11,
+                      help = "lowest address to give (default 0x11)")
+    cmd.add_argument( '--from', dest = 'shared', type = lambda x: int( x, 0),
+                      default = 0x10,
+                      help = "address the devices share now (default 0x10)")
+    args = parser.parse_args( argv)
+
+    if args.command == 'bench':
+        return _benchCommand( args)
+    if args.command == 'daemon':
+        return _daemonCommand( args)
+    if args.command == 'scan':
+        return _scanCommand( args)
+    if args.command == 'provision':
+        return _provisionCommand( args)
     print( "tfli2c - This Python module supports the Benewake" +\
            " TFLuna Lidar device in I2C mode.")
+    return 0
+
+def _benchCommand( args):
+    import platform
+    if args.sim:
+        simulate( args.addr, [ args.port], byteTime = args.byte_time)
+    results = bench( args.addr, args.port, args.seconds, args.case, args.fps)
+
+    #  The table goes to stderr when the JSON goes to stdout
+    out = sys.stderr if args.json == '-' else sys.stdout
+    print( f"{'case':10} {'calls/s':>10} {'samples/s':>10}" +
+           f" {'p50 ms':>8} {'p99 ms':>8}" +
+           f" {'txn/smp':>8} {'cpu us/smp':>10}", file = out)
+    for r in results:
+        print( f"{r['case']:10} {r['callsPerSecond']:10.1f}" +
+               f" {r['samplesPerSecond']:10.1f}" +
+               f" {r['latencyP50'] * 1000:8.3f} {r['latencyP99'] * 1000:8.3f}" +
+               f" {r['transactionsPerSample']:8.2f}" +
+               f" {r['cpuPerSample'] * 1e6:10.1f}", file = out)
+
+    if args.json:
+        report = { 'version': __version__,
+                   'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'time': time.time(),
+                   'port': args.port,
+                   'addrs': args.addr,
+                   'simulated': args.sim,
+                   'results': results}
+        if args.json == '-':
+            json.dump( report, sys.stdout, indent = 2)
+            print()
+        else:
+            with open( args.json, 'w') as file:
+                json.dump( report, file, indent = 2)
+    return 0
+
+def _daemonCommand( args):
+    ports = {}
+    for spec in args.bus:
+        port, addrs = spec.split( ':')
+        ports[ int( port)] = [ int( addr, 0) for addr in addrs.split( ',')]
+    if args.sim:
+        buses = { port: SimBus( port, [ SimLuna( addr) for addr in addrs])
+                  for port, addrs in ports.items()}
+        setBackend( lambda port: buses[ port])
+    try:
+        daemon = Daemon( ports, args.rate, args.name, args.capacity)
+    except OSError as error:
+        print( f"tfli2c daemon: {error.strerror}", file = sys.stderr)
+        return 1
+    print( f"tfli2c daemon: publishing {daemon.sensors} to '{args.name}'")
+    import signal
+    signal.signal( signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+    return 0
+
+def _scanCommand( args):
+    ports = args.port
+    if args.sim:
+        ports = ports or [ tflPort]
+        simulate( [ 0x10, 0x11, 0x12], ports)
+    started = time.monotonic()
+    found = scan( ports)
+    for device in found:
+        kind = f"TF-Luna {device.prodCode} v{device.version}"\
+               if device.prodCode else "other device"
+        print( f"/dev/i2c-{device.port}  0x{device.addr:02X}  {kind}")
+    print( f"{len( found)} devices in {time.monotonic() - started:.2f}s")
+    return 0
+
+def _provisionCommand( args):
+    def connect( n):
+        input( f"Connect device {n + 1} of {args.count} and press Enter ")
+    results = provision( args.port, args.count,
+                         connect if args.count > 1 else None,
+                         range( args.start, 0x78), args.shared)
+    for result in results:
+        print( f"0x{result.addr:02X}  {'ok' if result.ok else 'FAILED'}")
+    return 0 if all( result.ok for result in results) else 1
+
+# If this module is executed by itself
+if __name__ == "__main__":
+    sys.exit( main())
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -